@@ -0,0 +1,233 @@
+"""Benchmarks for opening, scrolling, annotating and saving PDFs in the editor.
+
+Every case runs in its own process under Qt's offscreen platform, so peak RSS
+is measured per case. Results are written as JSON and can be compared with an
+earlier run:
+
+    python benchmarks/bench_editor.py -o before.json
+    python benchmarks/bench_editor.py -o after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KINDS = ("text", "image")
+SCROLL_STEPS = 100  # Scroll positions visited, spread over the whole document
+ANNOTATED_PAGES = 20
+SETTLE_TIMEOUT = 30.0  # Seconds to wait for the visible pages to render
+SIDECAR_SUFFIX = ".pdfedit.json"  # As in pdf_editor, which is only imported by the cases
+JOURNAL_SUFFIX = ".pdfedit.journal"
+
+def generate_pdf(kind, pages, path):
+    """Write a synthetic document, the same for the same kind and page count"""
+    import fitz
+    rng = random.Random(pages)
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"{kind} page {page_num + 1}", fontsize=18)
+        if kind == "text":
+            lines = [" ".join(rng.choice(("lorem", "ipsum", "dolor", "sit", "amet", "elit"))
+                              for _ in range(12)) for _ in range(50)]
+            page.insert_textbox(fitz.Rect(72, 100, 540, 760), "\n".join(lines), fontsize=9)
+        else:
+            samples = bytes(rng.getrandbits(8) for _ in range(128 * 96 * 3))
+            pixmap = fitz.Pixmap(fitz.csRGB, 128, 96, samples, False)
+            page.insert_image(fitz.Rect(72, 100, 540, 451), pixmap=pixmap)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def settle(app, window, timeout=SETTLE_TIMEOUT):
+    """Process events until no page renders are outstanding"""
+    deadline = time.perf_counter() + timeout
+    app.processEvents()
+    while window.renderer.jobs and time.perf_counter() < deadline:
+        window.renderer.pool.waitForDone(10)
+        app.processEvents()
+
+def run_case(pdf_path, output_path):
+    """Time each phase for one document in this process, return the metrics"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, ROOT)
+    import pdf_editor
+    from PyQt5.QtCore import QPointF
+    from PyQt5.QtWidgets import QApplication, QFileDialog, QMessageBox
+
+    app = QApplication([sys.argv[0]])
+    window = pdf_editor.PDFEditor()
+    window.resize(1200, 900)
+    window.show()
+    app.processEvents()
+    results = {}
+
+    start = time.perf_counter()
+    window.open_document(pdf_path)
+    deadline = start + SETTLE_TIMEOUT
+    while window.first_page_seconds is None and time.perf_counter() < deadline:
+        window.renderer.pool.waitForDone(1)
+        app.processEvents()
+    results["first_page_s"] = window.first_page_seconds
+    # The rest of the document is laid out in the background
+    while len(window.page_items) < len(window.pdf_doc) and time.perf_counter() < deadline:
+        app.processEvents()
+    settle(app, window)
+    results["open_s"] = time.perf_counter() - start
+
+    # Then its text is indexed for find, kept out of the other phases
+    start = time.perf_counter()
+    while window.indexer.job is not None:
+        app.processEvents()
+        time.sleep(0.001)
+    results["index_s"] = time.perf_counter() - start
+
+    scroll_bar = window.view.verticalScrollBar()
+    start = time.perf_counter()
+    for step in range(1, SCROLL_STEPS + 1):
+        scroll_bar.setValue(scroll_bar.maximum() * step // SCROLL_STEPS)
+        settle(app, window)
+    results["scroll_s"] = time.perf_counter() - start
+    # How well the pixmap cache served opening and scrolling, for tuning PDF_EDITOR_CACHE_MB
+    stats = window.pixmap_cache.stats()
+    for name in ("hits", "misses", "evictions"):
+        results["cache_" + name] = stats[name]
+
+    strokes = [[[x, 20 + 15 * (x % 7)] for x in range(0, 200, 5)]]
+    asset = pdf_editor.signature_assets.add_strokes(strokes, (200, 130))
+    start = time.perf_counter()
+    for page_item, _ in window.page_items[:ANNOTATED_PAGES]:
+        text_item = pdf_editor.MovableTextItem("Benchmark note", window.undo_stack)
+        text_item.setFont(window.toolbar_font())
+        text_item.setPos(page_item.scenePos() + QPointF(100, 100))
+        window.undo_stack.push(pdf_editor.AddItemCommand(window.scene, text_item))
+        window.add_signature_at_position(asset, page_item.scenePos() + QPointF(400, 600))
+    app.processEvents()
+    results["annotate_s"] = time.perf_counter() - start
+
+    # Answer the save dialog as a user would and report failures instead of showing them
+    errors = []
+    QFileDialog.getSaveFileName = staticmethod(
+        lambda *args, **kwargs: (output_path, pdf_editor.SAVE_FILTER))
+    QMessageBox.information = staticmethod(lambda *args, **kwargs: None)
+    QMessageBox.critical = staticmethod(lambda parent, title, text, *rest: errors.append(text))
+    start = time.perf_counter()
+    window.save_pdf()
+    results["save_s"] = time.perf_counter() - start
+    if errors:
+        results["error"] = errors[0]
+    results["output_bytes"] = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+
+    # Again with images downsampled, fonts subset and objects compressed
+    compact_path = os.path.splitext(output_path)[0] + "-compact.pdf"
+    compact_filter = next(name for name, profile in pdf_editor.PROFILE_FILTERS.items()
+                          if profile == "compact")
+    QFileDialog.getSaveFileName = staticmethod(
+        lambda *args, **kwargs: (compact_path, compact_filter))
+    start = time.perf_counter()
+    window.save_pdf()
+    results["save_compact_s"] = time.perf_counter() - start
+    if errors:
+        results.setdefault("error", errors[0])
+    results["compact_bytes"] = os.path.getsize(compact_path) if os.path.exists(compact_path) else 0
+
+    window.close()
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def environment():
+    import fitz
+    from PyQt5.QtCore import QT_VERSION_STR
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                  capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = ""
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "pymupdf": fitz.VersionBind, "qt": QT_VERSION_STR,
+            "revision": revision, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def compare(results, baseline):
+    """Print each metric next to the baseline, with the ratio new / old"""
+    old_cases = {case["case"]: case for case in baseline["results"]}
+    metrics = ("first_page_s", "open_s", "index_s", "scroll_s", "annotate_s", "save_s",
+               "save_compact_s", "peak_rss_mb", "output_bytes", "compact_bytes", "cache_hits",
+               "cache_misses", "cache_evictions")
+    print(f"{'case':<14}{'metric':<16}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for case in results:
+        old = old_cases.get(case["case"])
+        if old is None:
+            continue
+        for metric in metrics:
+            if metric in case and metric in old:
+                ratio = case[metric] / old[metric] if old[metric] else float("nan")
+                print(f"{case['case']:<14}{metric:<16}{old[metric]:>12.3f}"
+                      f"{case[metric]:>12.3f}{ratio:>8.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", default="10,200,2000",
+                        help="Comma separated page counts (default: 10,200,2000)")
+    parser.add_argument("--kinds", default=",".join(KINDS),
+                        help="Comma separated document kinds: text, image")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(),
+                                                           "pdf_editor_bench"),
+                        help="Where generated documents are kept between runs")
+    parser.add_argument("-o", "--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Results of an earlier run to compare with")
+    parser.add_argument("--case", nargs=2, metavar=("PDF", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(*args.case)))
+        return 0
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = []
+    for kind in args.kinds.split(","):
+        for pages in (int(count) for count in args.pages.split(",")):
+            name = f"{kind}-{pages}"
+            pdf_path = os.path.join(args.work_dir, name + ".pdf")
+            if not os.path.exists(pdf_path):
+                generate_pdf(kind, pages, pdf_path)
+            output_path = os.path.join(args.work_dir, name + "-saved.pdf")
+            compact_path = os.path.join(args.work_dir, name + "-saved-compact.pdf")
+            # Project files left by a previous run would add annotations to the documents
+            for path in (pdf_path + SIDECAR_SUFFIX, pdf_path + JOURNAL_SUFFIX,
+                         output_path + SIDECAR_SUFFIX, compact_path + SIDECAR_SUFFIX):
+                if os.path.exists(path):
+                    os.remove(path)
+            child = subprocess.run([sys.executable, os.path.abspath(__file__),
+                                    "--case", pdf_path, output_path],
+                                   capture_output=True, text=True)
+            if child.returncode != 0:
+                case = {"error": child.stderr.strip().splitlines()[-1:]}
+            else:
+                case = json.loads(child.stdout.strip().splitlines()[-1])
+            case.update(case=name, kind=kind, pages=pages,
+                        input_bytes=os.path.getsize(pdf_path))
+            results.append(case)
+            print(json.dumps(case), flush=True)
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return 1 if any("error" in case for case in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
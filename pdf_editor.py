@@ -1,55 +1,1178 @@
+import time
+
+LAUNCH_TIME = time.perf_counter()  # Start of the time-to-first-page measurement
+
+import argparse
+import base64
+import bisect
+import copy
+import hashlib
+import importlib
+import json
+import math
+import os
+import re
+import tempfile
 import sys
+import threading
+from array import array
+from collections import OrderedDict
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QFileDialog, QGraphicsView, 
                             QGraphicsScene, QGraphicsPixmapItem, QPushButton, 
                             QMessageBox, QUndoStack, QUndoCommand, QShortcut,
                             QStyle, QFrame, QVBoxLayout, QHBoxLayout, 
-                            QSizePolicy, QInputDialog, QDialog, QLabel)  # Added QDialog and QLabel
+                            QSizePolicy, QInputDialog, QDialog, QLabel,  # Added QDialog and QLabel
+                            QFontComboBox, QSpinBox, QLineEdit, QGraphicsRectItem, QMenu)
 from PyQt5.QtGui import (QPixmap, QPainter, QPen, QImage, QKeySequence, 
-                        QIcon, QTransform)  # Added QTransform
-from PyQt5.QtCore import Qt, QPoint
-import fitz  # PyMuPDF
+                        QIcon, QTransform, QFont, QFontMetricsF, QFontInfo, QColor,  # Added QTransform
+                        QPainterPath, QPolygonF)
+from PyQt5.QtCore import (Qt, QPoint, QObject, QRunnable, QThread, QThreadPool,
+                          pyqtSignal, QBuffer, QIODevice, QEvent, QTimer)
+
+class LazyModule:
+    """Module imported on first use, so the window can be built while it loads"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def preload(self):
+        """Import the module on a background thread"""
+        threading.Thread(target=importlib.import_module, args=(self._name,), daemon=True).start()
+
+fitz = LazyModule("fitz")  # PyMuPDF
 from PyQt5.QtWidgets import (QGraphicsItem, QGraphicsTextItem, 
                            QGraphicsPixmapItem, QGraphicsSceneMouseEvent)
 from PyQt5.QtCore import QRectF, QPointF
 
+PAGE_ZOOM = 2.1  # Scene pixels per PDF point
+PAGE_SPACING = 20  # Space between pages
+RENDER_MARGIN = 1.0  # Viewport heights rasterized above and below the visible area
+KEEP_MARGIN = 3.0  # Pages further away than this drop their pixmap
+PREFETCH_SECONDS = 0.5  # Scrolling time rendered ahead of the viewport in the direction of travel
+MAX_PREFETCH = 4.0  # Viewport heights, on top of RENDER_MARGIN
+SCROLL_IDLE_MS = 200  # Scrolling has stopped after this long without movement
+SCROLL_STEP = 100  # Pixels per wheel notch
+SCROLL_FRAME_MS = 16
+SCROLL_EASING = 0.25  # Share of the remaining scroll distance covered per frame
+TILE_SIZE = 512  # Edge of a high-resolution tile in device pixels
+# Resolution levels render at PAGE_ZOOM * 2 ** level, levels above 0 are tiled
+MIN_LEVEL = -3
+MAX_LEVEL = 3
+MIN_VIEW_SCALE = 0.1
+MAX_VIEW_SCALE = 8.0
+# Memory budget for cached page pixmaps, override with PDF_EDITOR_CACHE_MB
+CACHE_BUDGET_MB = int(os.environ.get("PDF_EDITOR_CACHE_MB", "256"))
+UNDO_BUDGET_MB = int(os.environ.get("PDF_EDITOR_UNDO_MB", "32"))  # Item data kept for undo
+COMMAND_BYTES = 256  # Rough cost of a command that only records a position or size
+DEFAULT_FONT_SIZE = 14
+SAVE_FILTER = "PDF Files (*.pdf)"
+PROFILE_FILTERS = {  # Save dialog filter -> save profile
+    SAVE_FILTER: "standard",
+    "Compact PDF, for email and the web (*.pdf)": "compact",
+    "Smallest PDF, images at 96 dpi (*.pdf)": "smallest",
+}
+FLATTEN_FILTERS = {  # Save dialog filter -> (image format of flattened pages, save profile)
+    "Flattened PDF, PNG pages (*.pdf)": ("PNG", "standard"),
+    "Flattened PDF, JPEG pages (*.pdf)": ("JPEG", "standard"),
+    "Compact flattened PDF, JPEG pages (*.pdf)": ("JPEG", "compact"),
+}
+FLATTEN_DPI = 150
+JPEG_QUALITY = 85
+OVERLAY_KEY = "PDFEditorOverlay"  # Page key listing the content streams written by the editor
+SIDECAR_SUFFIX = ".pdfedit.json"  # Project file stored next to the PDF
+SIDECAR_VERSION = 1
+PAGE_TREE_VERSION = (1, 24)  # Oldest PyMuPDF whose internals unlink_page and link_page use
+IMAGE_REWRITE_VERSION = (1, 26, 1)  # Oldest PyMuPDF with Document.rewrite_images
+JOURNAL_SUFFIX = ".pdfedit.journal"  # Edits since the sidecar was written, replayed after a crash
+JOURNAL_VERSION = 1
+JOURNAL_SYNC_MS = 1000  # Longest time an edit waits in the journal before it is synced to disk
+LAYOUT_FIRST_PAGES = 10  # Pages laid out before the first one is shown
+LAYOUT_CHUNK = 200  # Pages laid out per event loop turn after that
+TEXT_INDEX_CACHE = 4  # Documents whose text index is kept after switching to another
+SIGNATURE_PEN_WIDTH = 3
+SIGNATURE_TOLERANCE = 0.75  # Pixels a simplified stroke may deviate from the drawn one
+
+def document_fingerprint(doc, path):
+    """Cheap identity of a document on disk, used to key cached renderings"""
+    st = os.stat(path)
+    trailer_id = doc.xref_get_key(-1, "ID")[1]
+    key = f"{st.st_size}|{st.st_mtime_ns}|{len(doc)}|{trailer_id}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def file_fingerprint(path):
+    doc = fitz.open(path)
+    try:
+        return document_fingerprint(doc, path)
+    finally:
+        doc.close()
+
+class PixmapCache:
+    """LRU cache of rendered page pixmaps bounded by a byte budget.
+
+    Keys are (document fingerprint, page number, zoom, rotation, tile) where
+    tile is None for a whole page.
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def get(self, key):
+        pixmap = self.entries.get(key)
+        if pixmap is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return pixmap
+
+    def put(self, key, pixmap):
+        nbytes = self.pixmap_bytes(pixmap)
+        if nbytes > self.budget_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size_bytes -= self.pixmap_bytes(old)
+        self.entries[key] = pixmap
+        self.size_bytes += nbytes
+        self.evict()
+
+    def evict(self):
+        while self.size_bytes > self.budget_bytes and self.entries:
+            _, pixmap = self.entries.popitem(last=False)
+            self.size_bytes -= self.pixmap_bytes(pixmap)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.size_bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "size_bytes": self.size_bytes,
+            "budget_bytes": self.budget_bytes,
+        }
+
+class Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.add_span(self.name, self.start, time.perf_counter(), self.args)
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Tracer:
+    """Opt-in timed spans and counters, exported as a Chrome trace (chrome://tracing, Perfetto).
+
+    Disabled unless a path is given, in which case span() costs a single attribute check.
+    """
+    HISTOGRAM_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    def __init__(self):
+        self.path = None
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.events = []
+        self.thread_names = {}
+        self.page_render_ms = {}  # page_num -> durations of its render spans
+
+    def enable(self, path):
+        self.path = path
+
+    def span(self, name, **args):
+        if self.path is None:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def counter(self, name, **values):
+        if self.path is not None:
+            self.add_event({"name": name, "ph": "C", "ts": self.timestamp(time.perf_counter()),
+                            "args": values})
+
+    def timestamp(self, seconds):
+        return (seconds - self.origin) * 1e6
+
+    def add_span(self, name, start, end, args):
+        self.add_event({"name": name, "ph": "X", "ts": self.timestamp(start),
+                        "dur": (end - start) * 1e6, "args": args})
+        if name == "render":
+            with self.lock:
+                self.page_render_ms.setdefault(args["page"], []).append((end - start) * 1000)
+
+    def add_event(self, event):
+        thread = threading.current_thread()
+        event.update(pid=os.getpid(), tid=thread.ident)
+        with self.lock:
+            self.thread_names.setdefault(thread.ident, thread.name)
+            self.events.append(event)
+
+    def render_histogram(self):
+        """Count of page renders per duration bucket, keyed by the bucket's upper bound in ms"""
+        counts = dict.fromkeys([*map(str, self.HISTOGRAM_MS), "inf"], 0)
+        for durations in self.page_render_ms.values():
+            for ms in durations:
+                bound = next((str(b) for b in self.HISTOGRAM_MS if ms <= b), "inf")
+                counts[bound] += 1
+        return counts
+
+    def export(self):
+        if self.path is None:
+            return
+        names = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                  "args": {"name": name}} for tid, name in self.thread_names.items()]
+        pages = {str(page_num + 1): {"count": len(durations), "total_ms": sum(durations),
+                                     "max_ms": max(durations)}
+                 for page_num, durations in sorted(self.page_render_ms.items())}
+        histogram = self.render_histogram()
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": names + self.events, "displayTimeUnit": "ms",
+                       "renderHistogram": histogram, "pageRenderTimes": pages}, f)
+        print(f"Trace written to {self.path}", file=sys.stderr)
+        print("Page render times:", file=sys.stderr)
+        for bound, count in histogram.items():
+            print(f"  <= {bound:>4} ms: {count}", file=sys.stderr)
+
+tracer = Tracer()
+
+_thread_state = threading.local()
+_documents_generation = 0  # Bumped when files the workers have open were rewritten
+
+def reopen_thread_documents():
+    """Make every thread open its documents again on next use"""
+    global _documents_generation
+    _documents_generation += 1
+
+def thread_document(source):
+    """Return a fitz.Document for source that belongs to the calling thread only.
+
+    MuPDF documents are not thread-safe, so every worker keeps its own handle.
+    """
+    docs = getattr(_thread_state, "docs", None)
+    if docs is None or _thread_state.generation != _documents_generation:
+        for doc in (docs or {}).values():
+            doc.close()
+        docs = _thread_state.docs = {}
+        _thread_state.generation = _documents_generation
+    doc = docs.get(source)
+    if doc is None:
+        # Only the most recent documents are worth keeping open
+        while len(docs) >= 4:
+            docs.pop(next(iter(docs))).close()
+        doc = docs[source] = fitz.open(source)
+    return doc
+
+def tile_clip(tile, zoom):
+    """Page area in PDF points covered by tile (column, row) at zoom"""
+    column, row = tile
+    size = TILE_SIZE / zoom
+    return fitz.Rect(column * size, row * size, (column + 1) * size, (row + 1) * size)
+
+def document_page(doc, page_num, rotation=None):
+    """Page of a worker's document, turned to the rotation the editor shows it with"""
+    page = doc[page_num]
+    if rotation is not None and page.rotation != rotation:
+        page.set_rotation(rotation)
+    return page
+
+def render_page_image(doc, page_num, zoom, hide_overlay=False, clip=None, rotation=None):
+    page = document_page(doc, page_num, rotation)
+    if hide_overlay:
+        # Overlays already shown as live items must not be rendered twice
+        remove_page_contents(page, page_overlay_xrefs(page))
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip)
+    # Copy so the image owns its pixels once pix is gone
+    return QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888).copy()
+
+def paint_annotations(painter, annotations):
+    """Paint annotation records with the painter set up in PDF point units"""
+    for annotation in annotations:
+        if isinstance(annotation, TextAnnotation):
+            font = QFont(annotation.font_family)
+            font.setPointSizeF(annotation.font_size)
+            font.setBold(annotation.bold)
+            font.setItalic(annotation.italic)
+            painter.setFont(font)
+            painter.setPen(QColor.fromRgbF(*annotation.color))
+            for i, line in enumerate(annotation.text.split("\n")):
+                painter.drawText(QPointF(annotation.x, annotation.y + i * annotation.line_height),
+                                 line)
+        elif isinstance(annotation, ImageAnnotation):
+            x0, y0, x1, y1 = annotation.rect
+            painter.drawImage(QRectF(x0, y0, x1 - x0, y1 - y0),
+                              QImage.fromData(annotation.image_data))
+        elif isinstance(annotation, StrokeAnnotation):
+            scale_x, scale_y, x0, y0 = annotation.mapping()
+            painter.save()
+            painter.translate(x0, y0)
+            painter.scale(scale_x, scale_y)
+            painter.setPen(QPen(QColor.fromRgbF(*annotation.color), annotation.stroke_width,
+                                Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+            painter.drawPath(strokes_path(annotation.strokes))
+            painter.restore()
+
+def strokes_path(strokes):
+    path = QPainterPath()
+    for stroke in strokes:
+        path.moveTo(*stroke[0])
+        for point in stroke[1:]:
+            path.lineTo(*point)
+        if len(stroke) == 1:
+            path.lineTo(*stroke[0])  # A dot, drawn by the round cap
+    return path
+
+def flatten_page(doc, page_num, annotations, dpi, image_format, hide_overlay=False,
+                 jpeg_quality=JPEG_QUALITY):
+    """Composite a page with its annotations and encode it, on any thread that doc belongs to"""
+    zoom = dpi / 72
+    with tracer.span("compose", page=page_num, dpi=dpi):
+        image = render_page_image(doc, page_num, zoom, hide_overlay)
+        image = image.convertToFormat(QImage.Format_RGB32)
+        # At 72 dots per inch one font point is one unit, matching the annotation geometry
+        image.setDotsPerMeterX(round(72 / 0.0254))
+        image.setDotsPerMeterY(round(72 / 0.0254))
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.scale(zoom, zoom)
+        paint_annotations(painter, annotations)
+        painter.end()
+    quality = jpeg_quality if image_format == "JPEG" else -1
+    return image_to_bytes(image, image_format, quality)
+
+class PageRenderJob(QRunnable):
+    def __init__(self, renderer, key, hide_overlay=False):
+        super().__init__()
+        self.setAutoDelete(False)  # The renderer owns the job until it finishes
+        self.renderer = renderer
+        # ((source, page_num, rotation), zoom, tile), tile is None for the whole page
+        self.key = key
+        self.hide_overlay = hide_overlay
+        self.priority = 0
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled:
+            return
+        (source, page_num, rotation), zoom, tile = self.key
+        clip = tile_clip(tile, zoom) if tile is not None else None
+        try:
+            with tracer.span("render", page=page_num, zoom=zoom, tile=tile):
+                image = render_page_image(thread_document(source), page_num, zoom,
+                                          self.hide_overlay, clip, rotation)
+        except Exception as e:
+            print(f"Could not render page {page_num + 1}: {e}", file=sys.stderr)
+            image = QImage()
+        if not self.cancelled:
+            try:
+                self.renderer.job_finished.emit(self, image)
+            except RuntimeError:
+                pass  # The editor was closed
+
+class PageRenderer(QObject):
+    """Rasterizes pages and tiles on a worker pool and delivers them to the GUI thread"""
+    job_finished = pyqtSignal(object, QImage)
+    page_ready = pyqtSignal(object, QImage)  # (page, zoom, tile), image
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, QThread.idealThreadCount()))
+        # Pages are (source file, page number in it, rotation), so a page that moves
+        # within the document keeps its renderings
+        self.jobs = {}  # (page, zoom, tile) -> PageRenderJob
+        self.job_finished.connect(self._on_job_finished)
+
+    def request(self, key, hide_overlay=False, priority=0):
+        """Queue a render, jobs with a higher priority start first"""
+        job = self.jobs.get(key)
+        if job is not None:
+            # Requeue a job that is still waiting if it became more or less urgent
+            if job.priority != priority and self.pool.tryTake(job):
+                job.priority = priority
+                self.pool.start(job, priority)
+            return
+        job = PageRenderJob(self, key, hide_overlay)
+        job.priority = priority
+        self.jobs[key] = job
+        self.pool.start(job, priority)
+        tracer.counter("render_jobs", pending=len(self.jobs))
+
+    def is_pending(self, key):
+        return key in self.jobs
+
+    def page_jobs(self, page):
+        return [key for key in self.jobs if key[0] == page]
+
+    def cancel(self, key):
+        job = self.jobs.pop(key, None)
+        if job is not None:
+            job.cancelled = True
+            self.pool.tryTake(job)
+
+    def cancel_page(self, page):
+        for key in self.page_jobs(page):
+            self.cancel(key)
+
+    def cancel_all(self):
+        for key in list(self.jobs):
+            self.cancel(key)
+
+    def _on_job_finished(self, job, image):
+        # Results of cancelled or superseded jobs are dropped
+        if self.jobs.get(job.key) is not job:
+            return
+        del self.jobs[job.key]
+        if not image.isNull():
+            self.page_ready.emit(job.key, image)
+
+def page_words(doc, page_num, rotation=None):
+    """Index entry for a page: its lowercase text, and per word the text offset,
+    the box in displayed page coordinates and the line, packed in arrays to stay small
+    """
+    page = document_page(doc, page_num, rotation)
+    matrix = page.rotation_matrix
+    starts, boxes, lines = array("i"), array("f"), array("i")
+    text = []
+    offset = 0
+    for x0, y0, x1, y1, word, block, line, _ in page.get_text("words"):
+        rect = fitz.Rect(x0, y0, x1, y1) * matrix
+        starts.append(offset)
+        boxes.extend((rect.x0, rect.y0, rect.x1, rect.y1))
+        lines.append(block << 16 | line)
+        text.append(word)
+        offset += len(word) + 1
+    return " ".join(text).lower(), starts, boxes, lines
+
+class TextIndex:
+    """Searchable words of a document, filled in page by page"""
+    def __init__(self, page_count):
+        self.page_count = page_count
+        self.pages = {}  # page_num -> entry from page_words()
+
+    def is_complete(self):
+        return len(self.pages) == self.page_count
+
+    def add_page(self, page_num, entry):
+        self.pages[page_num] = entry
+
+    def search_page(self, page_num, query):
+        """Matches of query on an indexed page, each a list of rects, one per line it spans"""
+        text, starts, boxes, lines = self.pages[page_num]
+        hits = []
+        start = text.find(query)
+        while start != -1:
+            first = bisect.bisect_right(starts, start) - 1
+            last = bisect.bisect_right(starts, start + len(query) - 1) - 1
+            rects = {}
+            for word in range(first, last + 1):
+                rect = fitz.Rect(*boxes[4 * word:4 * word + 4])
+                line = lines[word]
+                rects[line] = rects[line] | rect if line in rects else rect
+            hits.append(list(rects.values()))
+            start = text.find(query, start + 1)
+        return hits
+
+class TextIndexJob(QRunnable):
+    def __init__(self, indexer, pages):
+        super().__init__()
+        self.setAutoDelete(False)  # The indexer owns the job until it finishes
+        self.indexer = indexer
+        self.pages = pages  # (page_num, source, page number in source, rotation)
+        self.cancelled = False
+
+    def run(self):
+        # Rendering the pages on screen comes first
+        QThread.currentThread().setPriority(QThread.LowestPriority)
+        for page_num, source, source_page, rotation in self.pages:
+            if self.cancelled:
+                return
+            entry = ("", array("i"), array("f"), array("i"))
+            try:
+                if source is not None:  # Blank pages have no words
+                    entry = page_words(thread_document(source), source_page, rotation)
+            except Exception as e:
+                print(f"Could not index page {page_num + 1}: {e}", file=sys.stderr)
+            try:
+                self.indexer.page_indexed.emit(self, page_num, entry)
+            except RuntimeError:
+                return  # The editor was closed
+
+class TextIndexer(QObject):
+    """Extracts the words of a document on a background thread, delivering them page by page"""
+    page_indexed = pyqtSignal(object, int, object)
+    page_ready = pyqtSignal(int)  # page_num, added to the index
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.job = None
+        self.index = None
+        self.page_indexed.connect(self._on_page_indexed)
+
+    def start(self, index, pages):
+        """Add pages, as listed by TextIndexJob, to index"""
+        self.cancel()
+        self.index = index
+        if pages:
+            self.job = TextIndexJob(self, pages)
+            self.pool.start(self.job)
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancelled = True
+            self.pool.tryTake(self.job)
+            self.job = None
+
+    def _on_page_indexed(self, job, page_num, entry):
+        # Pages of a cancelled job belong to another document
+        if job is not self.job:
+            return
+        self.index.add_page(page_num, entry)
+        if page_num == job.pages[-1][0]:
+            self.job = None
+        self.page_ready.emit(page_num)
+
+class TextAnnotation:
+    """Text placed on a page. x, y is the baseline origin of the first line in PDF points."""
+    def __init__(self, page_num, x, y, text, font_family="Helvetica", font_size=12,
+                 bold=False, italic=False, color=(0, 0, 0), line_height=None, point_size=None):
+        self.page_num = page_num
+        self.x = x
+        self.y = y
+        self.text = text
+        self.font_family = font_family
+        self.font_size = font_size
+        self.bold = bold
+        self.italic = italic
+        self.color = color
+        self.line_height = line_height or font_size * 1.2
+        self.point_size = point_size  # Qt point size of the editor item it came from
+
+class ImageAnnotation:
+    """Image placed on a page. rect is (x0, y0, x1, y1) in PDF points."""
+    def __init__(self, page_num, rect, image_data, asset=None):
+        self.page_num = page_num
+        self.rect = rect
+        self.image_data = image_data  # Encoded PNG/JPEG bytes
+        # Content hash, identical images are stored once in sidecars and PDFs
+        self.asset = asset or hashlib.sha1(image_data).hexdigest()
+
+class StrokeAnnotation:
+    """Vector signature placed on a page. rect is (x0, y0, x1, y1) in PDF points.
+
+    strokes are polylines in the signature's own coordinates, spanning size.
+    """
+    def __init__(self, page_num, rect, strokes, size, stroke_width, color=(0, 0, 0),
+                 asset=None):
+        self.page_num = page_num
+        self.rect = rect
+        self.strokes = strokes
+        self.size = size
+        self.stroke_width = stroke_width
+        self.color = color
+        self.asset = asset or strokes_digest(strokes, size, stroke_width)
+
+    def mapping(self):
+        """Scale and offset from signature coordinates to page points"""
+        x0, y0, x1, y1 = self.rect
+        return (x1 - x0) / self.size[0], (y1 - y0) / self.size[1], x0, y0
+
+def strokes_digest(strokes, size, stroke_width):
+    return hashlib.sha1(json.dumps([strokes, size, stroke_width]).encode()).hexdigest()
+
+def simplify_stroke(points, tolerance=SIGNATURE_TOLERANCE):
+    """Drop points closer than tolerance to the line through their neighbours (Douglas-Peucker)"""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    ranges = [(0, len(points) - 1)]
+    while ranges:
+        first, last = ranges.pop()
+        (x0, y0), (x1, y1) = points[first], points[last]
+        dx, dy = x1 - x0, y1 - y0
+        length = math.hypot(dx, dy)
+        max_distance, index = 0, None
+        for i in range(first + 1, last):
+            x, y = points[i]
+            if length:
+                distance = abs(dy * (x - x0) - dx * (y - y0)) / length
+            else:
+                distance = math.hypot(x - x0, y - y0)
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if index is not None and max_distance > tolerance:
+            keep[index] = True
+            ranges.append((first, index))
+            ranges.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+def annotation_to_dict(annotation, assets):
+    """Serialize an annotation record, storing image data once per content hash in assets"""
+    if isinstance(annotation, TextAnnotation):
+        return {"type": "text", "x": annotation.x, "y": annotation.y, "text": annotation.text,
+                "font": annotation.font_family, "size": annotation.font_size,
+                "bold": annotation.bold, "italic": annotation.italic,
+                "color": list(annotation.color), "line_height": annotation.line_height,
+                "point_size": annotation.point_size}
+    if isinstance(annotation, StrokeAnnotation):
+        if annotation.asset not in assets:
+            assets[annotation.asset] = {"strokes": annotation.strokes, "size": annotation.size,
+                                        "width": annotation.stroke_width}
+        return {"type": "strokes", "rect": list(annotation.rect), "asset": annotation.asset,
+                "color": list(annotation.color)}
+    if annotation.asset not in assets:
+        assets[annotation.asset] = base64.b64encode(annotation.image_data).decode("ascii")
+    return {"type": "signature", "rect": list(annotation.rect), "asset": annotation.asset}
+
+def annotation_from_dict(page_num, data, assets):
+    if data["type"] == "text":
+        return TextAnnotation(
+            page_num, data["x"], data["y"], data["text"], data.get("font", "Helvetica"),
+            data.get("size", 12), data.get("bold", False), data.get("italic", False),
+            tuple(data.get("color", (0, 0, 0))), data.get("line_height"),
+            data.get("point_size"))
+    if data["type"] == "signature":
+        return ImageAnnotation(page_num, tuple(data["rect"]),
+                               base64.b64decode(assets[data["asset"]]), data["asset"])
+    if data["type"] == "strokes":
+        asset = assets[data["asset"]]
+        return StrokeAnnotation(page_num, tuple(data["rect"]), asset["strokes"],
+                                tuple(asset["size"]), asset["width"],
+                                tuple(data.get("color", (0, 0, 0))), data["asset"])
+    raise ValueError(f"Unknown annotation type {data['type']!r}")
+
+class EditJournal:
+    """Append-only log of edits, one JSON object per line.
+
+    The first line holds the fingerprint of the file the journal applies to. Each
+    following line holds all annotation records of one page, in file page numbers,
+    as an edit left them, so replaying the lines in order gives every page's last state.
+    """
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.assets = set()  # Assets already written, later lines refer to them
+        self.unsynced = False
+        self.file = open(path, "w", encoding="utf-8")
+        self.append({"version": JOURNAL_VERSION, "fingerprint": fingerprint})
+
+    def append(self, record):
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        # Survives a crash of the editor from here, and of the system once synced
+        self.file.flush()
+        self.unsynced = True
+
+    def add_page(self, page_num, records, assets):
+        record = {"page": page_num, "annotations": records}
+        new_assets = {digest: assets[digest] for digest in
+                      {data["asset"] for data in records if "asset" in data} - self.assets}
+        if new_assets:
+            record["assets"] = new_assets
+            self.assets.update(new_assets)
+        self.append(record)
+
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = False
+
+    def close(self, remove=False):
+        self.file.close()
+        if remove:
+            os.remove(self.path)
+
+def read_journal(path, fingerprint):
+    """Return (pages, assets) recorded by the journal at path, None if there are none
+    for the file with this fingerprint"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    pages, assets = {}, {}
+    for line_num, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break  # Cut short by a crash while it was written
+        if line_num == 0:
+            if record.get("fingerprint") != fingerprint:
+                return None
+            continue
+        pages[record["page"]] = record["annotations"]
+        assets.update(record.get("assets", {}))
+    return (pages, assets) if pages else None
+
+def base14_fontname(family, bold=False, italic=False):
+    """Pick the closest PDF base-14 font for a font family name"""
+    name = family.lower()
+    if any(key in name for key in ("courier", "mono", "consol", "typewriter")):
+        base = ("cour", "coit", "cobo", "cobi")
+    elif "sans" not in name and any(key in name for key in ("times", "serif", "roman",
+                                                              "georgia", "garamond")):
+        base = ("tiro", "tiit", "tibo", "tibi")
+    else:
+        base = ("helv", "heit", "hebo", "hebi")
+    return base[bool(bold) * 2 + bool(italic)]
+
+def text_is_encodable(text, fontname):
+    font = fitz.Font(fontname)
+    return all(font.has_glyph(ord(char)) for char in text if not char.isspace())
+
+def write_annotations(page, annotations, image_xrefs=None):
+    """Write annotations into a page as native PDF text and images.
+
+    Annotation geometry is in the page's visible (rotated) coordinates. Images
+    already embedded in the document are looked up by asset in image_xrefs and
+    referenced instead of being embedded again.
+    """
+    if image_xrefs is None:
+        image_xrefs = {}
+    derotate = page.derotation_matrix
+    for annotation in annotations:
+        if isinstance(annotation, TextAnnotation):
+            fontname = base14_fontname(annotation.font_family, annotation.bold,
+                                       annotation.italic)
+            for i, line in enumerate(annotation.text.split("\n")):
+                origin = fitz.Point(annotation.x, annotation.y + i * annotation.line_height)
+                page.insert_text(origin * derotate, line, fontname=fontname,
+                                 fontsize=annotation.font_size, color=annotation.color,
+                                 rotate=page.rotation)
+        elif isinstance(annotation, ImageAnnotation):
+            rect = fitz.Rect(annotation.rect) * derotate
+            xref = image_xrefs.get(annotation.asset)
+            if xref:
+                page.insert_image(rect, xref=xref, rotate=page.rotation)
+            else:
+                image_xrefs[annotation.asset] = page.insert_image(
+                    rect, stream=annotation.image_data, rotate=page.rotation)
+        elif isinstance(annotation, StrokeAnnotation):
+            scale_x, scale_y, x0, y0 = annotation.mapping()
+            shape = page.new_shape()
+            for stroke in annotation.strokes:
+                points = [fitz.Point(x0 + x * scale_x, y0 + y * scale_y) * derotate
+                          for x, y in stroke]
+                if len(points) == 1:
+                    points.append(points[0])  # A dot, drawn by the round cap
+                shape.draw_polyline(points)
+            shape.finish(color=annotation.color, width=annotation.stroke_width * scale_x,
+                         lineCap=1, lineJoin=1, closePath=False)
+            shape.commit()
+
+def scene_to_page_rect(rect):
+    return (rect.left() / PAGE_ZOOM, rect.top() / PAGE_ZOOM,
+            rect.right() / PAGE_ZOOM, rect.bottom() / PAGE_ZOOM)
+
+def xref_array(xrefs):
+    return "[" + " ".join(f"{xref} 0 R" for xref in xrefs) + "]"
+
+def page_overlay_xrefs(page):
+    """Content streams recorded in the page as written by the editor"""
+    kind, value = page.parent.xref_get_key(page.xref, OVERLAY_KEY)
+    if kind != "array":
+        return []
+    return [int(xref) for xref in re.findall(r"(\d+) 0 R", value)]
+
+def remove_page_contents(page, xrefs):
+    xrefs = set(xrefs)
+    keep = [xref for xref in page.get_contents() if xref not in xrefs]
+    page.parent.xref_set_key(page.xref, "Contents", xref_array(keep))
+
+def page_tree_unsupported():
+    """Why pages cannot be taken out and put back with this PyMuPDF, None if they can"""
+    version = tuple(int(part) for part in fitz.VersionBind.split(".")[:2])
+    if (version < PAGE_TREE_VERSION or not hasattr(fitz, "_as_pdf_document")
+            or not hasattr(fitz.Document, "_reset_page_refs")):
+        return (f"Deleting and inserting pages needs PyMuPDF "
+                f"{'.'.join(map(str, PAGE_TREE_VERSION))} or later, not {fitz.VersionBind}")
+    return None
+
+def edit_page_tree(doc, edit):
+    """Return edit(pdf, mupdf) run on the MuPDF document under doc.
+
+    PyMuPDF has no public API to take a page object out of the page tree and put the
+    same object back, which undoing deletes and inserts needs, so this uses its internals.
+    """
+    problem = page_tree_unsupported()
+    if problem:
+        raise RuntimeError(problem)
+    result = edit(fitz._as_pdf_document(doc), fitz.mupdf)
+    doc._reset_page_refs()  # Page objects PyMuPDF holds point at the old page numbers
+    return result
+
+def unlink_page(doc, page_num):
+    """Take a page out of the page tree and return its xref, the object stays for link_page"""
+    def unlink(pdf, mupdf):
+        # Attributes inherited from the page tree would be lost once the page is moved
+        mupdf.pdf_flatten_inheritable_page_items(mupdf.pdf_lookup_page_obj(pdf, page_num))
+        mupdf.pdf_delete_page(pdf, page_num)
+    xref = doc.page_xref(page_num)
+    edit_page_tree(doc, unlink)
+    return xref
+
+def link_page(doc, page_num, xref):
+    """Put the page object xref into the page tree at page_num"""
+    edit_page_tree(doc, lambda pdf, mupdf: mupdf.pdf_insert_page(
+        pdf, page_num, mupdf.pdf_new_indirect(pdf, xref, 0)))
+
+def rotate_page_point(point, size, turns):
+    """Where point on a page of size (width, height) ends up after the page is turned
+    clockwise by turns quarter turns"""
+    (x, y), (width, height) = point, size
+    for _ in range(turns % 4):
+        x, y, width, height = height - y, x, height, width
+    return x, y
+
+def write_overlay(page, annotations, old_xrefs=(), image_xrefs=None):
+    """Replace the editor's overlay on a page and return the xrefs of its content streams.
+
+    The overlay lives in its own content streams so a later save can swap it out
+    without touching the original page content.
+    """
+    doc = page.parent
+    if old_xrefs:
+        remove_page_contents(page, old_xrefs)
+    if not annotations:
+        doc.xref_set_key(page.xref, OVERLAY_KEY, "null")
+        return []
+    page.wrap_contents()
+    before = set(page.get_contents())
+    write_annotations(page, annotations, image_xrefs)
+    xrefs = [xref for xref in page.get_contents() if xref not in before]
+    doc.xref_set_key(page.xref, OVERLAY_KEY, xref_array(xrefs))
+    return xrefs
+
+class SaveProfile:
+    """How hard a save works on the size of the file.
+
+    Images above image_dpi are downsampled to it and recompressed as JPEG,
+    None leaves them as they are. flatten_dpi is the resolution of flattened pages.
+    """
+    def __init__(self, name, image_dpi=None, jpeg_quality=JPEG_QUALITY, flatten_dpi=FLATTEN_DPI,
+                 subset_fonts=False, object_streams=False, linearize=False):
+        self.name = name
+        self.image_dpi = image_dpi
+        self.jpeg_quality = jpeg_quality
+        self.flatten_dpi = flatten_dpi
+        self.subset_fonts = subset_fonts
+        self.object_streams = object_streams  # Compress the small objects together
+        self.linearize = linearize  # Reorder for fast web view, needs qpdf
+        self.garbage = 4 if object_streams else 3  # 4 also merges duplicate streams
+
+SAVE_PROFILES = {profile.name: profile for profile in (
+    SaveProfile("standard"),
+    SaveProfile("compact", image_dpi=150, jpeg_quality=75, subset_fonts=True,
+                object_streams=True, linearize=True),
+    SaveProfile("smallest", image_dpi=96, jpeg_quality=60, flatten_dpi=96, subset_fonts=True,
+                object_streams=True, linearize=True),
+)}
+
+def save_document(doc, file, copy=False, profile=SAVE_PROFILES["standard"]):
+    """Write doc to file as profile says and return notes for the save report.
+
+    Set copy to keep doc as it is, always for the document open in the editor. Garbage
+    collection renumbers the objects of the saved document and drops unused ones, and
+    profiles rewrite its images and fonts.
+    """
+    notes = []
+    with tracer.span("write", file=file, profile=profile.name):
+        if copy:
+            doc = fitz.open("pdf", doc.tobytes())
+        problem = image_rewriting_unsupported() if profile.image_dpi else None
+        if problem:
+            notes.append(problem)
+        elif profile.image_dpi:
+            # Images already close to the target are not worth recompressing again
+            doc.rewrite_images(dpi_threshold=round(profile.image_dpi * 1.1),
+                               dpi_target=profile.image_dpi, quality=profile.jpeg_quality)
+        if profile.subset_fonts:
+            try:
+                doc.subset_fonts()
+            except Exception as e:
+                notes.append(f"Fonts were not subset: {e}")
+        doc.save(file, garbage=profile.garbage, deflate=True,
+                 use_objstms=int(profile.object_streams))
+    if profile.linearize:
+        with tracer.span("linearize", file=file):
+            notes.append(linearize_pdf(file))
+    return notes
+
+def image_rewriting_unsupported():
+    """Why images cannot be downsampled with this PyMuPDF, None if they can"""
+    version = tuple(int(part) for part in re.findall(r"\d+", fitz.VersionBind)[:3])
+    if version < IMAGE_REWRITE_VERSION or not hasattr(fitz.Document, "rewrite_images"):
+        return (f"Images were not downsampled, that needs PyMuPDF "
+                f"{'.'.join(map(str, IMAGE_REWRITE_VERSION))} or later, not {fitz.VersionBind}")
+    return None
+
+def save_report(before, after, seconds):
+    change = f" ({(after - before) / before:+.0%})" if before else ""
+    return (f"{after / 1e6:.2f} MB written in {seconds:.2f} s, "
+            f"the original is {before / 1e6:.2f} MB{change}")
+
+def linearize_pdf(path):
+    """Rewrite a PDF for fast web view with qpdf, MuPDF no longer writes linearized files.
+    Returns a note for the save report."""
+    import shutil
+    import subprocess
+    qpdf = shutil.which("qpdf")
+    if qpdf is None:
+        return "Not linearized for fast web view, qpdf is not installed"
+    temp_path = path + ".tmp"
+    result = subprocess.run([qpdf, "--linearize", "--object-streams=preserve", path, temp_path],
+                            capture_output=True, text=True)
+    # Exit status 3 means the output was written with warnings
+    if result.returncode not in (0, 3):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return f"Not linearized for fast web view: {result.stderr.strip()}"
+    os.replace(temp_path, path)
+    return "Linearized for fast web view"
+
+def image_to_bytes(image, fmt="PNG", quality=-1):
+    with tracer.span("encode", format=fmt, width=image.width(), height=image.height()):
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, fmt, quality)
+        return bytes(buffer.data())
+
+class SignatureAsset:
+    """A signature shared by every item showing it, either an image or vector strokes"""
+    def __init__(self, digest, width, height, data=None, pixmap=None, strokes=None,
+                 stroke_width=SIGNATURE_PEN_WIDTH):
+        self.digest = digest
+        self.width = width
+        self.height = height
+        self.data = data  # PNG bytes written to PDFs and sidecars
+        self.pixmap = pixmap
+        self.strokes = strokes  # Polylines in the asset's coordinates
+        self.stroke_width = stroke_width
+        self.path = strokes_path(strokes) if strokes else None
+
+class SignatureAssetStore:
+    """Signature images shared by content hash across items, pages and documents"""
+    def __init__(self):
+        self.assets = {}
+
+    def add_image(self, image):
+        # Convert to support transparency
+        image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        return self.add_data(image_to_bytes(image))
+
+    def add_data(self, data, digest=None):
+        digest = digest or hashlib.sha1(data).hexdigest()
+        asset = self.assets.get(digest)
+        if asset is None:
+            pixmap = QPixmap()
+            pixmap.loadFromData(data)
+            asset = self.assets[digest] = SignatureAsset(digest, pixmap.width(), pixmap.height(),
+                                                         data=data, pixmap=pixmap)
+        return asset
+
+    def add_strokes(self, strokes, size, stroke_width=SIGNATURE_PEN_WIDTH, digest=None):
+        digest = digest or strokes_digest(strokes, size, stroke_width)
+        asset = self.assets.get(digest)
+        if asset is None:
+            asset = self.assets[digest] = SignatureAsset(digest, size[0], size[1],
+                                                         strokes=strokes,
+                                                         stroke_width=stroke_width)
+        return asset
+
+signature_assets = SignatureAssetStore()
+
+class DocumentScene(QGraphicsScene):
+    # Emitted with the scene area whose annotations were added, moved, resized or removed
+    annotations_changed = pyqtSignal(QRectF)
+    # Emitted with an annotation item after it was added, moved, resized or removed
+    item_changed = pyqtSignal(object)
+
+class PageLayout:
+    """Vertical extent of every page in scene coordinates, searched by bisection"""
+    def __init__(self):
+        self.tops = []
+        self.bottoms = []
+
+    def append(self, top, height):
+        self.tops.append(top)
+        self.bottoms.append(top + height)
+
+    def clear(self):
+        self.tops = []
+        self.bottoms = []
+
+    def replace(self, first, end, tops, bottoms):
+        """Set the extents of the pages from first up to end, None for all the rest"""
+        self.tops[first:end] = tops
+        self.bottoms[first:end] = bottoms
+
+    def page_at(self, y):
+        """Page number whose extent contains y, None in the gaps between pages"""
+        page_num = bisect.bisect_right(self.tops, y) - 1
+        if page_num >= 0 and y < self.bottoms[page_num]:
+            return page_num
+        return None
+
+    def pages_between(self, top, bottom):
+        """Page numbers overlapping the range top..bottom"""
+        return range(bisect.bisect_right(self.bottoms, top), bisect.bisect_left(self.tops, bottom))
+
+class PageItem(QGraphicsItem):
+    """Placeholder for a PDF page that is rasterized only when needed.
+
+    A whole-page preview is stretched over the page and sharper tiles of the
+    current resolution level are drawn on top of it as they arrive.
+    """
+    def __init__(self, page_num, width, height, page_rotation=0, source=None, source_page=None,
+                 parent=None):
+        super().__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)  # Exposed rect for tiles
+        self.page_num = page_num
+        self.page_rotation = page_rotation
+        # File and page the content is rendered from, None for a blank page
+        self.source = source
+        self.source_page = source_page
+        self.source_rotation = page_rotation
+        self.rect = QRectF(0, 0, width, height)
+        self.pixmap = None
+        self.pixmap_zoom = None
+        self.tiles = {}  # (zoom, column, row) -> pixmap
+
+    def boundingRect(self):
+        return self.rect
+
+    def source_key(self):
+        """The page's key for the renderer, the same wherever it is in the document"""
+        return (self.source, self.source_page, self.page_rotation)
+
+    def paint(self, painter, option, widget):
+        with tracer.span("paint", page=self.page_num):
+            if self.pixmap is None:
+                painter.fillRect(self.rect, Qt.white)
+            else:
+                painter.drawPixmap(self.rect, self.pixmap, QRectF(self.pixmap.rect()))
+            for (zoom, column, row), pixmap in sorted(self.tiles.items(),
+                                                      key=lambda tile: tile[0]):
+                scale = PAGE_ZOOM / zoom
+                target = QRectF(column * TILE_SIZE * scale, row * TILE_SIZE * scale,
+                                pixmap.width() * scale, pixmap.height() * scale)
+                if target.intersects(option.exposedRect):
+                    painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+    def set_pixmap(self, pixmap, zoom=PAGE_ZOOM):
+        self.pixmap = pixmap
+        self.pixmap_zoom = zoom
+        self.update()
+
+    def set_tile(self, zoom, tile, pixmap):
+        self.tiles[(zoom, *tile)] = pixmap
+        self.update()
+
+    def drop_tiles(self, keep=lambda key: False):
+        dropped = [key for key in self.tiles if not keep(key)]
+        for key in dropped:
+            del self.tiles[key]
+        if dropped:
+            self.update()
+
+    def clear_pixmap(self):
+        self.pixmap = None
+        self.pixmap_zoom = None
+        self.tiles.clear()
+        self.update()
+
 class DrawingArea(QFrame):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setFixedSize(380, 160)
-        # Create transparent canvas
-        self.canvas = QPixmap(380, 160)
-        self.canvas.fill(Qt.transparent)  # Changed from white to transparent
-        self.last_point = None
+        # Strokes are kept as polylines, so the signature stays sharp at any size
+        self.strokes = []
+        self.pen = QPen(Qt.black, SIGNATURE_PEN_WIDTH, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
         self.is_drawing = False
 
     def paintEvent(self, event):
         painter = QPainter(self)
         # Set white background for display only
         painter.fillRect(self.rect(), Qt.white)
-        painter.drawPixmap(0, 0, self.canvas)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.pen)
+        for stroke in self.strokes:
+            if len(stroke) == 1:
+                painter.drawPoint(stroke[0])
+            else:
+                painter.drawPolyline(QPolygonF(stroke))
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.is_drawing = True
-            self.last_point = event.pos()
+            self.strokes.append([QPointF(event.pos())])
+            self.update()
 
     def mouseMoveEvent(self, event):
         if self.is_drawing:  # Removed the event.button() check
-            painter = QPainter(self.canvas)
-            painter.setPen(QPen(Qt.black, 3, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-            painter.drawLine(self.last_point, event.pos())
-            self.last_point = event.pos()
-            painter.end()
-            self.update()
+            stroke = self.strokes[-1]
+            stroke.append(QPointF(event.pos()))
+            # Only repaint the new segment
+            margin = SIGNATURE_PEN_WIDTH
+            self.update(QRectF(stroke[-2], stroke[-1]).normalized().toAlignedRect()
+                        .adjusted(-margin, -margin, margin, margin))
 
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and self.is_drawing:
             self.is_drawing = False
+            points = [(point.x(), point.y()) for point in self.strokes[-1]]
+            self.strokes[-1] = [QPointF(x, y) for x, y in simplify_stroke(points)]
+            self.update()
 
     def clear(self):
-        self.canvas.fill(Qt.white)
+        self.strokes = []
         self.update()
 
+    def signature_strokes(self):
+        """Strokes moved to the origin, with the size of the box that holds them"""
+        if not self.strokes:
+            return [], (0, 0)
+        points = [point for stroke in self.strokes for point in stroke]
+        margin = SIGNATURE_PEN_WIDTH / 2
+        left = min(point.x() for point in points) - margin
+        top = min(point.y() for point in points) - margin
+        right = max(point.x() for point in points) + margin
+        bottom = max(point.y() for point in points) + margin
+        strokes = [[[round(point.x() - left, 1), round(point.y() - top, 1)] for point in stroke]
+                   for stroke in self.strokes]
+        return strokes, (round(right - left, 1), round(bottom - top, 1))
+
 class SignatureDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -83,8 +1206,9 @@ class SignatureDialog(QDialog):
         self.setLayout(layout)
 
     def get_signature(self):
-        # Convert to ARGB32_Premultiplied for transparency support
-        return self.drawing_area.canvas.toImage().convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        """Return the drawn strokes and their size, or None if nothing was drawn"""
+        strokes, size = self.drawing_area.signature_strokes()
+        return (strokes, size) if strokes else None
 
 class MovableTextItem(QGraphicsTextItem):
     def __init__(self, text, undo_stack, parent=None):  # Add undo_stack parameter
@@ -118,40 +1242,116 @@ class MovableTextItem(QGraphicsTextItem):
         if (event.pos().x() > self.boundingRect().right() - self.handle_size and 
             event.pos().y() > self.boundingRect().bottom() - self.handle_size):
             self.resizing = True
+            self.old_size = self.item_size()
+            # Preview the resize by scaling a cached rendering, the text is laid out on release
+            self.setCacheMode(QGraphicsItem.ItemCoordinateCache)
         else:
             super().mousePressEvent(event)
     
     def mouseMoveEvent(self, event: QGraphicsSceneMouseEvent):
         if self.resizing:
             # Calculate new scale based on mouse movement
-            new_size = event.pos().x() / self.boundingRect().width()
-            font = self.font()
-            new_point_size = int(font.pointSize() * new_size)
+            new_size = event.pos().x() * self.scale() / self.boundingRect().width()
             # Enforce minimum size
-            if new_point_size >= self.min_font_size:
-                font.setPointSize(new_point_size)
-                self.setFont(font)
-                # Update the scene immediately for smooth visual feedback
-                self.scene().update()
+            if self.font().pointSizeF() * new_size >= self.min_font_size:
+                # Qt repaints only the item's old and new bounds
+                self.setScale(new_size)
         else:
             super().mouseMoveEvent(event)
     
     def mouseReleaseEvent(self, event: QGraphicsSceneMouseEvent):
         if self.resizing:
             self.resizing = False
+            self.commit_scale()
+            if self.item_size() != self.old_size:  # Not for a click on the handle
+                self.undo_stack.push(ResizeItemCommand(self, self.old_size, self.item_size()))
         elif self.pos() != self.old_pos:
             self.undo_stack.push(  # Use stored undo_stack reference
                 MoveItemCommand(self, self.old_pos, self.pos())
             )
         super().mouseReleaseEvent(event)
 
-class MovableSignatureItem(QGraphicsPixmapItem):
-    def __init__(self, pixmap, undo_stack, parent=None):  # Add undo_stack parameter
-        # Convert pixmap to support transparency
-        transparent_pixmap = QPixmap.fromImage(
-            pixmap.toImage().convertToFormat(QImage.Format_ARGB32_Premultiplied)
-        )
-        super().__init__(transparent_pixmap, parent)
+    def commit_scale(self):
+        """Turn the preview scale into a real font size"""
+        font = self.font()
+        font.setPointSizeF(round(font.pointSizeF() * self.scale(), 1))
+        self.setScale(1)
+        self.setCacheMode(QGraphicsItem.NoCache)
+        self.setFont(font)
+
+    def item_size(self):
+        return self.font().pointSizeF()
+
+    def set_item_size(self, size):
+        font = self.font()
+        font.setPointSizeF(size)
+        self.setFont(font)
+
+    def memory_size(self):
+        return 2048 + 2 * len(self.toPlainText())
+
+    def to_annotation(self, page_num, page_origin):
+        """Describe this item in PDF points relative to the page at page_origin"""
+        font = self.font()
+        metrics = QFontMetricsF(font)
+        margin = self.document().documentMargin()
+        baseline = self.mapToScene(QPointF(margin, margin + metrics.ascent())) - page_origin
+        color = self.defaultTextColor()
+        return TextAnnotation(
+            page_num, baseline.x() / PAGE_ZOOM, baseline.y() / PAGE_ZOOM, self.toPlainText(),
+            font.family(), QFontInfo(font).pixelSize() / PAGE_ZOOM, font.bold(), font.italic(),
+            (color.redF(), color.greenF(), color.blueF()), metrics.lineSpacing() / PAGE_ZOOM,
+            font.pointSizeF())
+
+    def to_pdf_annotation(self, page_num, page_origin):
+        annotation = self.to_annotation(page_num, page_origin)
+        fontname = base14_fontname(annotation.font_family, annotation.bold, annotation.italic)
+        if text_is_encodable(annotation.text, fontname):
+            return annotation
+        # Base-14 fonts cannot show this script, place the text as an image instead
+        rect = self.mapRectToScene(self.document_rect()).translated(-page_origin)
+        return ImageAnnotation(page_num, scene_to_page_rect(rect), image_to_bytes(self.to_image()))
+
+    @classmethod
+    def from_annotation(cls, annotation, page_origin, undo_stack):
+        item = cls(annotation.text, undo_stack)
+        font = item.font()
+        font.setFamily(annotation.font_family)
+        point_size = annotation.point_size
+        if point_size is None:
+            dpi = QApplication.primaryScreen().logicalDotsPerInchY()
+            point_size = annotation.font_size * PAGE_ZOOM * 72 / dpi
+        font.setPointSizeF(point_size)
+        font.setBold(annotation.bold)
+        font.setItalic(annotation.italic)
+        item.setFont(font)
+        item.setDefaultTextColor(QColor.fromRgbF(*annotation.color))
+        # Place the item so its first baseline lands on the recorded origin
+        margin = item.document().documentMargin()
+        item.setPos(page_origin + QPointF(annotation.x * PAGE_ZOOM - margin,
+                                          annotation.y * PAGE_ZOOM - margin
+                                          - QFontMetricsF(font).ascent()))
+        return item
+
+    def document_rect(self):
+        return QRectF(QPointF(0, 0), self.document().size())
+
+    def to_image(self, scale=3):
+        rect = self.document_rect()
+        image = QImage(int(rect.width() * scale), int(rect.height() * scale),
+                       QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        painter.scale(scale, scale)
+        self.document().drawContents(painter)
+        painter.end()
+        return image
+
+class MovableSignatureItem(QGraphicsItem):
+    def __init__(self, asset, undo_stack, parent=None):  # Add undo_stack parameter
+        super().__init__(parent)
         self.setFlag(QGraphicsItem.ItemIsMovable)
         self.setFlag(QGraphicsItem.ItemIsSelectable)
         self.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
@@ -160,71 +1360,169 @@ class MovableSignatureItem(QGraphicsPixmapItem):
         
         self.resizing = False
         self.handle_size = 10
-        self.original_pixmap = transparent_pixmap  # Store transparent version
+        self.asset = asset  # Shared, the item is sized by its scale
         self.min_width = 50  # Add minimum width limit
+
+    def content_rect(self):
+        return QRectF(0, 0, self.asset.width, self.asset.height)
+
+    def boundingRect(self):
+        return self.content_rect()
+
+    def handle_extent(self):
+        # The handle keeps its on-screen size whatever the item's scale
+        return self.handle_size / self.scale()
         
     def paint(self, painter, option, widget):
-        super().paint(painter, option, widget)
+        if self.asset.path is not None:
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QPen(Qt.black, self.asset.stroke_width, Qt.SolidLine,
+                                Qt.RoundCap, Qt.RoundJoin))
+            painter.drawPath(self.asset.path)
+        else:
+            # Smooth scaling is left for when the resize is released
+            painter.setRenderHint(QPainter.SmoothPixmapTransform, not self.resizing)
+            painter.drawPixmap(self.content_rect(), self.asset.pixmap,
+                               QRectF(self.asset.pixmap.rect()))
         if self.isSelected():
-            # Convert float coordinates to integers
-            x = int(self.boundingRect().bottomRight().x() - self.handle_size)
-            y = int(self.boundingRect().bottomRight().y() - self.handle_size)
-            # Draw resize handle with integer coordinates
-            painter.drawRect(x, y, self.handle_size, self.handle_size)
+            handle = self.handle_extent()
+            corner = self.boundingRect().bottomRight()
+            # Draw resize handle
+            painter.setPen(QPen(Qt.black, 0))
+            painter.drawRect(QRectF(corner.x() - handle, corner.y() - handle, handle, handle))
     
     def mousePressEvent(self, event):
         self.old_pos = self.pos()
-        if (event.pos().x() > self.boundingRect().right() - self.handle_size and 
-            event.pos().y() > self.boundingRect().bottom() - self.handle_size):
+        if (event.pos().x() > self.boundingRect().right() - self.handle_extent() and 
+            event.pos().y() > self.boundingRect().bottom() - self.handle_extent()):
             self.resizing = True
+            self.old_size = self.item_size()
         else:
             super().mousePressEvent(event)
     
     def mouseMoveEvent(self, event):
         if self.resizing:
-            # Calculate new size maintaining aspect ratio
-            new_width = max(self.min_width, event.pos().x())  # Enforce minimum width
-            aspect_ratio = self.original_pixmap.height() / self.original_pixmap.width()
-            new_height = new_width * aspect_ratio
-            
-            # Scale the pixmap with high quality
-            scaled_pixmap = self.original_pixmap.scaled(
-                int(new_width), 
-                int(new_height), 
-                Qt.KeepAspectRatio, 
-                Qt.SmoothTransformation
-            )
-            self.setPixmap(scaled_pixmap)
-            # Update the scene immediately for smooth visual feedback
-            self.scene().update()
+            # Enforce minimum width
+            # Qt repaints only the item's old and new bounds
+            self.resize_to(max(self.min_width, event.pos().x() * self.scale()))
         else:
             super().mouseMoveEvent(event)
     
     def mouseReleaseEvent(self, event):
         if self.resizing:
             self.resizing = False
+            self.update()  # Repaint with smooth scaling
+            if self.item_size() != self.old_size:  # Not for a click on the handle
+                self.undo_stack.push(ResizeItemCommand(self, self.old_size, self.item_size()))
         elif self.pos() != self.old_pos:
             self.undo_stack.push(  # Use stored undo_stack reference
                 MoveItemCommand(self, self.old_pos, self.pos())
             )
         super().mouseReleaseEvent(event)
 
-class AddItemCommand(QUndoCommand):
+    def resize_to(self, new_width):
+        # Scaling keeps the aspect ratio and shares the asset instead of copying it
+        self.setScale(new_width / self.asset.width)
+
+    def item_size(self):
+        return self.scale()
+
+    def set_item_size(self, size):
+        self.setScale(size)
+
+    def memory_size(self):
+        asset = self.asset
+        if asset.strokes:
+            return 1024 + 16 * sum(len(stroke) for stroke in asset.strokes)
+        return 1024 + len(asset.data) + asset.pixmap.width() * asset.pixmap.height() * 4
+
+    def to_annotation(self, page_num, page_origin):
+        """Describe this item in PDF points relative to the page at page_origin"""
+        rect = scene_to_page_rect(self.mapRectToScene(self.content_rect()).translated(-page_origin))
+        if self.asset.strokes:
+            return StrokeAnnotation(page_num, rect, self.asset.strokes,
+                                    (self.asset.width, self.asset.height),
+                                    self.asset.stroke_width, asset=self.asset.digest)
+        return ImageAnnotation(page_num, rect, self.asset.data, self.asset.digest)
+
+    to_pdf_annotation = to_annotation
+
+    @classmethod
+    def from_annotation(cls, annotation, page_origin, undo_stack):
+        if isinstance(annotation, StrokeAnnotation):
+            asset = signature_assets.add_strokes(annotation.strokes, annotation.size,
+                                                 annotation.stroke_width, annotation.asset)
+        else:
+            asset = signature_assets.add_data(annotation.image_data, annotation.asset)
+        item = cls(asset, undo_stack)
+        x0, y0, x1, y1 = annotation.rect
+        item.resize_to((x1 - x0) * PAGE_ZOOM)
+        item.setPos(page_origin + QPointF(x0 * PAGE_ZOOM, y0 * PAGE_ZOOM))
+        return item
+
+class EditCommand(QUndoCommand):
+    """Base for the editor's commands, which can be copied when old history is dropped"""
+    replayed = False  # Set while a copy is pushed back onto the stack, already applied
+
+    def retained_bytes(self):
+        return COMMAND_BYTES
+
+    def same_target(self, other):
+        return other.id() == self.id() and other.item is self.item and not other.replayed
+
+class AddItemCommand(EditCommand):
     def __init__(self, scene, item):
         super().__init__()
         self.scene = scene
         self.item = item
         self.setText("Add Item")
 
+    def clone(self):
+        return AddItemCommand(self.scene, self.item)
+
+    def retained_bytes(self):
+        return COMMAND_BYTES + self.item.memory_size()
+
     def undo(self):
+        self.scene.annotations_changed.emit(self.item.sceneBoundingRect())
         self.scene.removeItem(self.item)
-        self.scene.update()
+        self.scene.item_changed.emit(self.item)
 
     def redo(self):
+        if self.replayed:
+            return
         self.scene.addItem(self.item)
-        self.scene.update()
+        self.scene.annotations_changed.emit(self.item.sceneBoundingRect())
+        self.scene.item_changed.emit(self.item)
+
+class DeleteItemsCommand(EditCommand):
+    def __init__(self, scene, items):
+        super().__init__()
+        self.scene = scene
+        self.items = items
+        self.setText("Delete Items")
+
+    def clone(self):
+        return DeleteItemsCommand(self.scene, self.items)
+
+    def retained_bytes(self):
+        return COMMAND_BYTES + sum(item.memory_size() for item in self.items)
+
+    def undo(self):
+        for item in self.items:
+            self.scene.addItem(item)
+            self.scene.annotations_changed.emit(item.sceneBoundingRect())
+            self.scene.item_changed.emit(item)
+
+    def redo(self):
+        if self.replayed:
+            return
+        for item in self.items:
+            self.scene.annotations_changed.emit(item.sceneBoundingRect())
+            self.scene.removeItem(item)
+            self.scene.item_changed.emit(item)
 
-class MoveItemCommand(QUndoCommand):
+class MoveItemCommand(EditCommand):
     def __init__(self, item, old_pos, new_pos):
         super().__init__()
         self.item = item
@@ -233,15 +1531,237 @@ class MoveItemCommand(QUndoCommand):
         self.scene = item.scene()  # Get scene reference from item
         self.setText("Move Item")
 
+    def clone(self):
+        return MoveItemCommand(self.item, self.old_pos, self.new_pos)
+
+    def id(self):
+        return 1
+
+    def mergeWith(self, other):
+        # Consecutive drags of the same item undo as one step
+        if not self.same_target(other):
+            return False
+        self.new_pos = other.new_pos
+        return True
+
     def undo(self):
-        self.item.setPos(self.old_pos)
-        if self.scene:  # Check if scene exists
-            self.scene.update()
+        self.move_to(self.old_pos)
 
     def redo(self):
-        self.item.setPos(self.new_pos)
+        if not self.replayed:
+            self.move_to(self.new_pos)
+
+    def move_to(self, pos):
+        old_rect = self.item.sceneBoundingRect()
+        self.item.setPos(pos)
         if self.scene:  # Check if scene exists
-            self.scene.update()
+            self.scene.annotations_changed.emit(old_rect)
+            self.scene.annotations_changed.emit(self.item.sceneBoundingRect())
+            self.scene.item_changed.emit(self.item)
+
+class ResizeItemCommand(EditCommand):
+    """Change an item's size, a font size for text and a scale for signatures"""
+    def __init__(self, item, old_size, new_size):
+        super().__init__()
+        self.item = item
+        self.old_size = old_size
+        self.new_size = new_size
+        self.scene = item.scene()
+        self.setText("Resize Item")
+
+    def clone(self):
+        return ResizeItemCommand(self.item, self.old_size, self.new_size)
+
+    def id(self):
+        return 2
+
+    def mergeWith(self, other):
+        if not self.same_target(other):
+            return False
+        self.new_size = other.new_size
+        return True
+
+    def undo(self):
+        self.resize(self.old_size)
+
+    def redo(self):
+        if not self.replayed:
+            self.resize(self.new_size)
+
+    def resize(self, size):
+        old_rect = self.item.sceneBoundingRect()
+        self.item.set_item_size(size)
+        if self.scene:
+            self.scene.annotations_changed.emit(old_rect.united(self.item.sceneBoundingRect()))
+            self.scene.item_changed.emit(self.item)
+
+class FontItemsCommand(EditCommand):
+    def __init__(self, items, old_fonts, new_font):
+        super().__init__()
+        self.items = items
+        self.old_fonts = old_fonts
+        self.new_font = new_font
+        self.setText("Change Font")
+
+    def clone(self):
+        return FontItemsCommand(self.items, self.old_fonts, self.new_font)
+
+    def id(self):
+        return 3
+
+    def mergeWith(self, other):
+        # Stepping through sizes or families is one change
+        if other.id() != self.id() or other.items != self.items or other.replayed:
+            return False
+        self.new_font = other.new_font
+        return True
+
+    def undo(self):
+        for item, font in zip(self.items, self.old_fonts):
+            self.set_font(item, font)
+
+    def redo(self):
+        if not self.replayed:
+            for item in self.items:
+                self.set_font(item, self.new_font)
+
+    def set_font(self, item, font):
+        old_rect = item.sceneBoundingRect()
+        item.setFont(font)
+        if item.scene():
+            item.scene().annotations_changed.emit(old_rect.united(item.sceneBoundingRect()))
+            item.scene().item_changed.emit(item)
+
+class PageState:
+    """A page taken out of the document with everything attached to it, to be put back"""
+    def __init__(self, page_num, xref, page_item, label):
+        self.page_num = page_num
+        self.xref = xref  # Page object, kept in the document while it is out of the page tree
+        self.page_item = page_item
+        self.label = label
+        self.items = []  # (annotation item, position relative to the page)
+        self.overlay_xrefs = None
+        self.pending = None
+        self.dirty = False
+        self.text_entry = None
+
+    def memory_size(self):
+        return COMMAND_BYTES + sum(item.memory_size() for item, _ in self.items)
+
+class RotatePagesCommand(EditCommand):
+    def __init__(self, editor, page_nums, turns):
+        super().__init__()
+        self.editor = editor
+        self.page_nums = page_nums
+        self.turns = turns  # Quarter turns clockwise
+        self.setText("Rotate Pages")
+
+    def clone(self):
+        return RotatePagesCommand(self.editor, self.page_nums, self.turns)
+
+    def undo(self):
+        self.editor.rotate_pages(self.page_nums, -self.turns)
+
+    def redo(self):
+        if not self.replayed:
+            self.editor.rotate_pages(self.page_nums, self.turns)
+
+class MovePageCommand(EditCommand):
+    def __init__(self, editor, page_num, new_page_num):
+        super().__init__()
+        self.editor = editor
+        self.page_num = page_num
+        self.new_page_num = new_page_num
+        self.setText("Move Page")
+
+    def clone(self):
+        return MovePageCommand(self.editor, self.page_num, self.new_page_num)
+
+    def undo(self):
+        self.editor.move_page(self.new_page_num, self.page_num)
+
+    def redo(self):
+        if not self.replayed:
+            self.editor.move_page(self.page_num, self.new_page_num)
+
+class RemovePagesCommand(EditCommand):
+    def __init__(self, editor, page_nums, states=None):
+        super().__init__()
+        self.editor = editor
+        self.page_nums = page_nums
+        self.states = states  # Set while the pages are out
+        self.setText("Delete Pages")
+
+    def clone(self):
+        return RemovePagesCommand(self.editor, self.page_nums, self.states)
+
+    def retained_bytes(self):
+        return COMMAND_BYTES + sum(state.memory_size() for state in self.states or ())
+
+    def undo(self):
+        self.editor.put_pages(self.states)
+        self.states = None
+
+    def redo(self):
+        if not self.replayed:
+            self.states = self.editor.take_pages(self.page_nums)
+
+class InsertPagesCommand(EditCommand):
+    def __init__(self, editor, states):
+        super().__init__()
+        self.editor = editor
+        self.states = states  # The new pages, set while they are out
+        self.page_nums = [state.page_num for state in states]
+        self.setText("Insert Pages")
+
+    def clone(self):
+        command = InsertPagesCommand(self.editor, [])
+        command.states, command.page_nums = self.states, self.page_nums
+        return command
+
+    def retained_bytes(self):
+        return COMMAND_BYTES + sum(state.memory_size() for state in self.states or ())
+
+    def undo(self):
+        self.states = self.editor.take_pages(self.page_nums)
+
+    def redo(self):
+        if not self.replayed:
+            self.editor.put_pages(self.states)
+            self.states = None
+
+class BoundedUndoStack(QUndoStack):
+    """Undo stack that drops its oldest commands once they retain more than byte_limit"""
+    def __init__(self, byte_limit, parent=None):
+        super().__init__(parent)
+        self.byte_limit = byte_limit
+
+    def push(self, command):
+        super().push(command)
+        self.trim()
+
+    def retained_bytes(self):
+        return sum(self.command(i).retained_bytes() for i in range(self.count()))
+
+    def trim(self):
+        sizes = [self.command(i).retained_bytes() for i in range(self.count())]
+        total = sum(sizes)
+        if total <= self.byte_limit:
+            return
+        # Drop down to three quarters of the limit so trimming is not repeated on every push
+        first = 0
+        while first < len(sizes) - 1 and total > self.byte_limit * 3 // 4:
+            total -= sizes[first]
+            first += 1
+        # QUndoStack cannot remove its oldest commands, so rebuild it from copies of the rest.
+        # A push always discards the redo history, so every command left has been applied.
+        kept = [self.command(i).clone() for i in range(first, self.count())]
+        self.clear()
+        for command in kept:
+            command.replayed = True
+            super().push(command)
+        for command in kept:
+            command.replayed = False
 
 class PDFEditor(QMainWindow):
     def __init__(self):
@@ -256,11 +1776,58 @@ class PDFEditor(QMainWindow):
             int(screen.height() * 0.8)  # Convert to int
         )
 
-        # Initialize undo stack
-        self.undo_stack = QUndoStack(self)
+        # Initialize undo stack, bounded by the size of the items it keeps alive
+        self.undo_stack = BoundedUndoStack(UNDO_BUDGET_MB * 1024 * 1024, self)
 
         self.pdf_doc = None
+        self.pdf_path = None
+        self.fingerprint = None
+        self.source_fingerprints = {}  # File pages are rendered from -> fingerprint
+        # Pages were rotated, deleted, inserted or moved since the file was last written
+        self.structure_changed = False
+        self.dirty_pages = set()  # Pages whose annotations changed since the last save
+        self.overlay_xrefs = {}  # page_num -> overlay content streams written by this session
+        self.image_xrefs = {}  # Signature asset -> image xref already embedded in self.pdf_doc
+        # Sidecar annotations not restored yet, kept serialized until their page is shown
+        self.pending_annotations = {}
+        self.sidecar_assets = {}
+        # Edits are journaled as they happen, by page, until the sidecar is written
+        self.journal = None
+        self.journal_pages = set()  # Pages edited since the journal was last appended to
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.setInterval(JOURNAL_SYNC_MS)
+        self.journal_timer.timeout.connect(self.sync_journal)
+        # Rendered pages survive scrolling away and reopening the document
+        self.pixmap_cache = PixmapCache(CACHE_BUDGET_MB * 1024 * 1024)
         self.page_items = []  # Add this to store all page items
+        self.page_sources = {}  # PageItem.source_key() -> page items showing that page
+        self.page_layout = PageLayout()
+        self.page_offset = None  # Left edge of the pages, set by the first page laid out
+        # Scroll speed in pixels per second, negative when scrolling up
+        self.scroll_velocity = 0.0
+        self.last_scroll = None  # (scroll bar value, time)
+        self.scroll_idle_timer = QTimer(self)
+        self.scroll_idle_timer.setSingleShot(True)
+        self.scroll_idle_timer.setInterval(SCROLL_IDLE_MS)
+        self.scroll_idle_timer.timeout.connect(self.on_scroll_idle)
+        # Wheel scrolling glides towards scroll_target
+        self.scroll_target = None
+        self.scroll_timer = QTimer(self)
+        self.scroll_timer.setInterval(SCROLL_FRAME_MS)
+        self.scroll_timer.timeout.connect(self.scroll_frame)
+        # Annotation items by page, insertion ordered, and the page each item is on
+        self.page_annotations = {}
+        self.item_pages = {}
+        self.shown_pages = set()  # Pages holding a rendered pixmap or tiles
+        self.text_indexes = OrderedDict()  # fingerprint -> TextIndex, most recent last
+        self.text_index = None
+        self.find_query = ""
+        self.find_hits = []  # (page_num, rects) in page order
+        self.find_current = -1
+        self.find_highlights = []
+        self.first_page_seconds = None  # Time from opening to the first rendered page
+        self.open_time = None
         # Remove current_page and current_page_index as they won't be needed
         
         # Create central widget and main layout
@@ -274,11 +1841,25 @@ class PDFEditor(QMainWindow):
         self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.view.setRenderHint(QPainter.Antialiasing)
         self.view.setRenderHint(QPainter.SmoothPixmapTransform)
-        self.scene = QGraphicsScene()
+        self.view.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.scene = DocumentScene(self)
+        self.scene.annotations_changed.connect(self.mark_dirty)
+        self.scene.item_changed.connect(self.on_item_changed)
         self.view.setScene(self.scene)
         self.view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         layout.addWidget(self.view)
 
+        # Rasterize pages lazily on worker threads as they scroll into view
+        self.renderer = PageRenderer(self)
+        self.renderer.page_ready.connect(self.on_page_rendered)
+        # Index the text for find while the document is being read
+        self.indexer = TextIndexer(self)
+        self.indexer.page_ready.connect(self.on_page_indexed)
+        self.view.viewport().installEventFilter(self)
+        self.view.verticalScrollBar().valueChanged.connect(self.on_vertical_scroll)
+        self.view.verticalScrollBar().sliderPressed.connect(self.stop_smooth_scroll)
+        self.view.horizontalScrollBar().valueChanged.connect(self.update_visible_pages)
+
         # Button container
         button_container = QFrame()
         button_layout = QHBoxLayout(button_container)
@@ -289,6 +1870,19 @@ class PDFEditor(QMainWindow):
         btn_text = QPushButton("Add Text")
         btn_sign = QPushButton("Sign")
         btn_save = QPushButton("Save PDF")
+        btn_pages = QPushButton("Pages")
+        pages_menu = QMenu(btn_pages)
+        pages_menu.addAction("Rotate Right\tCtrl+R", lambda: self.rotate_current_page(1))
+        pages_menu.addAction("Rotate Left\tCtrl+Shift+R", lambda: self.rotate_current_page(-1))
+        pages_menu.addAction("Move Up", lambda: self.move_current_page(-1))
+        pages_menu.addAction("Move Down", lambda: self.move_current_page(1))
+        pages_menu.addSeparator()
+        pages_menu.addAction("Insert Blank Page", self.insert_blank_page)
+        pages_menu.addAction("Insert PDF...", lambda: self.insert_pdf(append=False))
+        pages_menu.addAction("Append PDF...", lambda: self.insert_pdf(append=True))
+        pages_menu.addSeparator()
+        pages_menu.addAction("Delete Page", self.delete_current_page)
+        btn_pages.setMenu(pages_menu)
         
         # Undo/Redo buttons
         btn_undo = QPushButton()
@@ -306,7 +1900,21 @@ class PDFEditor(QMainWindow):
         button_layout.addWidget(btn_text)
         button_layout.addWidget(btn_sign)
         button_layout.addWidget(btn_save)
+        button_layout.addWidget(btn_pages)
+
+        # Font for new text, or for the selected text items
+        self.font_box = QFontComboBox()
+        self.size_box = QSpinBox()
+        self.size_box.setRange(6, 144)
+        self.size_box.setValue(DEFAULT_FONT_SIZE)
+        button_layout.addWidget(self.font_box)
+        button_layout.addWidget(self.size_box)
         button_layout.addStretch()  # Add spacing between main buttons and undo/redo
+        self.find_box = QLineEdit()
+        self.find_box.setPlaceholderText("Find")
+        self.find_box.setClearButtonEnabled(True)
+        self.find_box.setFixedWidth(200)
+        button_layout.addWidget(self.find_box)
         button_layout.addWidget(btn_undo)
         button_layout.addWidget(btn_redo)
 
@@ -317,6 +1925,21 @@ class PDFEditor(QMainWindow):
         btn_save.clicked.connect(self.save_pdf)
         btn_undo.clicked.connect(self.undo_stack.undo)
         btn_redo.clicked.connect(self.undo_stack.redo)
+        self.font_box.currentFontChanged.connect(self.apply_font)
+        self.size_box.valueChanged.connect(self.apply_font)
+        self.scene.selectionChanged.connect(self.show_selected_font)
+        QShortcut(QKeySequence.Undo, self, self.undo_stack.undo)
+        QShortcut(QKeySequence.Redo, self, self.undo_stack.redo)
+        QShortcut(QKeySequence.Delete, self, self.delete_selected)
+        self.find_box.returnPressed.connect(self.find_next)
+        QShortcut(QKeySequence.Find, self, self.find_box.setFocus)
+        QShortcut(QKeySequence.FindNext, self, self.find_next)
+        QShortcut(QKeySequence.FindPrevious, self, self.find_previous)
+        QShortcut(QKeySequence.Save, self, self.save_to_source)
+        QShortcut(QKeySequence.ZoomIn, self, lambda: self.zoom_by(1.25))
+        QShortcut(QKeySequence.ZoomOut, self, lambda: self.zoom_by(1 / 1.25))
+        QShortcut(QKeySequence("Ctrl+R"), self, lambda: self.rotate_current_page(1))
+        QShortcut(QKeySequence("Ctrl+Shift+R"), self, lambda: self.rotate_current_page(-1))
 
         # Add button container to main layout
         layout.addWidget(button_container)
@@ -326,45 +1949,52 @@ class PDFEditor(QMainWindow):
     def open_pdf(self):
         file, _ = QFileDialog.getOpenFileName(self, "Open PDF", "", "PDF Files (*.pdf)")
         if file:
-            self.pdf_doc = fitz.open(file)
-            self.load_pdf_pages()
-            # Remove the fitInView call to maintain 100% scale
+            self.open_document(file)
 
-    def show_page(self):
-        if not self.pdf_doc:
+    def open_document(self, file):
+        # Time to first page includes reading the file and its sidecar
+        start = time.perf_counter()
+        try:
+            doc = fitz.open(file)
+        except Exception as e:
+            # The open document stays
+            QMessageBox.critical(self, "Error", f"Could not open PDF: {str(e)}")
             return
-        self.current_page = self.pdf_doc[self.current_page_index]
-        pix = self.current_page.get_pixmap(matrix=fitz.Matrix(2, 2))  # zoom x2 for better quality
-        qimage = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimage)
-        
-        self.scene.clear()
-        self.image_item = QGraphicsPixmapItem(pixmap)
-        self.scene.addItem(self.image_item)
-        self.canvas = QImage(pixmap.size(), QImage.Format_ARGB32_Premultiplied)
-        self.canvas.fill(Qt.transparent)
-        
-        # Set scene rect to match the pixmap size
-        self.scene.setSceneRect(self.image_item.boundingRect())
-        
-        # Don't auto-fit - show at 100% scale
-        self.view.setTransform(QTransform())  # Reset any existing transform
-        
-        # Center the content
-        self.view.centerOn(self.image_item)
+        self.open_time = start
+        self.first_page_seconds = None
+        if self.pdf_doc:
+            try:
+                self.write_sidecar()
+            except OSError as e:
+                QMessageBox.warning(self, "Warning", f"Could not save annotations: {str(e)}")
+        self.pdf_doc = doc
+        self.pdf_path = file
+        self.undo_stack.clear()  # Its items belong to the previous document
+        self.fingerprint = document_fingerprint(self.pdf_doc, file)
+        self.source_fingerprints = {file: self.fingerprint}
+        self.structure_changed = False
+        self.dirty_pages = set()
+        self.overlay_xrefs = {}
+        self.image_xrefs = {}
+        # Before the sidecar, which recover_journal writes from the items in the scene
+        self.clear_pages()
+        self.load_sidecar()
+        self.recover_journal()
+        self.text_index = None
+        self.load_pdf_pages()
+        # Remove the fitInView call to maintain 100% scale
 
     def add_text_mode(self):
         self.mode = "text"
 
-    def add_signature_at_position(self, signature, scene_pos):
+    def add_signature_at_position(self, asset, scene_pos):
         """Handle adding signature at the specified position"""
-        signature_pixmap = QPixmap.fromImage(signature)
-        scaled_signature = signature_pixmap.scaled(200, 100, Qt.KeepAspectRatio, 
-                                             Qt.SmoothTransformation)
-        
-        signature_item = MovableSignatureItem(scaled_signature, self.undo_stack)  # Pass undo_stack
-        signature_item.setPos(scene_pos.x() - scaled_signature.width()/2,
-                         scene_pos.y() - scaled_signature.height()/2)
+        signature_item = MovableSignatureItem(asset, self.undo_stack)  # Pass undo_stack
+        # Fit the signature into 200x100
+        signature_item.resize_to(asset.width * min(200 / asset.width, 100 / asset.height))
+        size = signature_item.sceneBoundingRect().size()
+        signature_item.setPos(scene_pos.x() - size.width()/2,
+                         scene_pos.y() - size.height()/2)
         
         self.undo_stack.push(AddItemCommand(self.scene, signature_item))
 
@@ -372,9 +2002,13 @@ class PDFEditor(QMainWindow):
         dialog = SignatureDialog(self)
         if dialog.exec_() == QDialog.Accepted:
             signature = dialog.get_signature()
+            if signature is None:
+                return
+            # Identical signatures share one asset, in memory and in the saved PDF
+            asset = signature_assets.add_strokes(*signature)
             cursor_pos = self.view.mapFromGlobal(self.cursor().pos())
             scene_pos = self.view.mapToScene(cursor_pos)
-            self.add_signature_at_position(signature, scene_pos)
+            self.add_signature_at_position(asset, scene_pos)
 
     def mousePressEvent(self, event):
         if not self.scene.items():
@@ -384,149 +2018,1136 @@ class PDFEditor(QMainWindow):
         view_pos = self.view.mapFrom(self, event.pos())
         scene_pos = self.view.mapToScene(view_pos)
         
-        # Check if click is within the document bounds
-        if self.scene.sceneRect().contains(scene_pos):
+        # Check if click is on a page
+        if self.page_item_at(scene_pos) is not None:
             # Show text input dialog
             text, ok = QInputDialog.getText(self, 'Add Text', 'Enter text:')
             if ok and text:
                 text_item = MovableTextItem(text, self.undo_stack)
-                font = text_item.font()
-                font.setPointSize(14)
-                text_item.setFont(font)
+                text_item.setFont(self.toolbar_font())
                 text_item.setDefaultTextColor(Qt.black)
                 text_item.setPos(scene_pos)
                 self.undo_stack.push(AddItemCommand(self.scene, text_item))
 
-    def mouseMoveEvent(self, event):
-        if self.is_drawing and self.mode == "sign":
-            painter = QPainter(self.canvas)
-            pen = QPen(Qt.blue, 3, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
-            painter.setPen(pen)
-            painter.drawLine(self.last_point, event.pos())
-            painter.end()
-            self.last_point = event.pos()
-            self.update_canvas()
+    def toolbar_font(self):
+        font = self.font_box.currentFont()
+        font.setPointSize(self.size_box.value())
+        return font
 
-    def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton and self.is_drawing:
-            self.is_drawing = False
+    def selected_text_items(self):
+        return [item for item in self.scene.selectedItems() if isinstance(item, MovableTextItem)]
 
-    def update_canvas(self):
-        # Create a temporary pixmap with the size of the original PDF
-        temp_pixmap = QPixmap(self.image_item.pixmap().size())
-        temp_pixmap.fill(Qt.transparent)
-        
-        # First draw the original PDF
-        painter = QPainter(temp_pixmap)
-        painter.drawPixmap(0, 0, self.image_item.pixmap())
-        
-        # Then overlay our annotations (text/signatures)
-        painter.drawImage(0, 0, self.canvas)
-        painter.end()
-        
-        # Update the view with combined result
-        self.image_item.setPixmap(temp_pixmap)
-        self.scene.update()
+    def apply_font(self):
+        items = self.selected_text_items()
+        font = self.toolbar_font()
+        items = [item for item in items if item.font() != font]
+        if items:
+            self.undo_stack.push(FontItemsCommand(items, [item.font() for item in items], font))
+
+    def show_selected_font(self):
+        items = self.selected_text_items()
+        if not items:
+            return
+        font = items[0].font()
+        for box in (self.font_box, self.size_box):
+            box.blockSignals(True)
+        self.font_box.setCurrentFont(font)
+        self.size_box.setValue(round(font.pointSizeF()))
+        for box in (self.font_box, self.size_box):
+            box.blockSignals(False)
+
+    def delete_selected(self):
+        items = [item for item in self.scene.selectedItems()
+                 if isinstance(item, (MovableTextItem, MovableSignatureItem))]
+        if items:
+            self.undo_stack.push(DeleteItemsCommand(self.scene, items))
+
+    def page_item_at(self, scene_pos):
+        page_num = self.page_layout.page_at(scene_pos.y())
+        if page_num is None:
+            return None
+        page_item = self.page_items[page_num][0]
+        return page_item if page_item.sceneBoundingRect().contains(scene_pos) else None
+
+    def index_item(self, item):
+        """Record which page an annotation item is on after it was added, moved or removed"""
+        old_page = self.item_pages.pop(item, None)
+        page_item = None
+        if item.scene() is self.scene:
+            page_item = self.page_item_at(item.sceneBoundingRect().center())
+        page_num = page_item.page_num if page_item is not None else None
+        if old_page is not None and old_page != page_num:
+            del self.page_annotations[old_page][item]
+        if page_num is not None:
+            self.item_pages[item] = page_num
+            self.page_annotations.setdefault(page_num, {})[item] = None
+
+    def on_item_changed(self, item):
+        """Index an item after an edit, and journal the pages it left and is now on"""
+        pages = {self.item_pages.get(item)}
+        self.index_item(item)
+        pages.add(self.item_pages.get(item))
+        pages.discard(None)
+        if pages and not self.journal_pages:
+            # Once per event loop turn, however many items the edit changed
+            QTimer.singleShot(0, self.write_journal)
+        self.journal_pages |= pages
+
+    def annotation_items(self):
+        return [item for item in self.scene.items(Qt.AscendingOrder)
+                if isinstance(item, (MovableTextItem, MovableSignatureItem))]
+
+    def mark_dirty(self, scene_rect):
+        for page_num in self.page_layout.pages_between(scene_rect.top(), scene_rect.bottom()):
+            if self.page_items[page_num][0].sceneBoundingRect().intersects(scene_rect):
+                self.dirty_pages.add(page_num)
+
+    def item_annotations(self, pages=None, for_pdf=False, file_pages=None):
+        """Yield page-relative annotation records of the live items.
+
+        Items dropped between pages are not indexed and not saved. With file_pages
+        from file_pages(), records are for the pages as they are in the file.
+        """
+        for page_num in sorted(self.page_annotations if pages is None else pages):
+            page_item = self.page_items[page_num][0]
+            page_origin = page_item.scenePos()
+            record_page, turns = page_num, 0
+            if file_pages is not None:
+                if page_num not in file_pages:
+                    continue  # Not in the file until the document is saved
+                record_page, turns = file_pages[page_num]
+            for item in self.page_annotations.get(page_num, ()):
+                convert = item.to_pdf_annotation if for_pdf else item.to_annotation
+                origin = page_origin
+                if turns:
+                    # Recorded where turning the page back would take the item
+                    center = item.sceneBoundingRect().center() - page_origin
+                    x, y = rotate_page_point((center.x(), center.y()), (page_item.rect.width(),
+                                             page_item.rect.height()), -turns)
+                    origin = page_origin + center - QPointF(x, y)
+                yield convert(record_page, origin)
+
+    def file_pages(self, pages=None):
+        """Page number in the open file and quarter turns since, of the pages that come from it"""
+        file_pages = {}
+        for page_num in range(len(self.page_items)) if pages is None else pages:
+            page_item = self.page_items[page_num][0]
+            if page_item.source == self.pdf_path:
+                file_pages[page_num] = (page_item.source_page, (page_item.page_rotation
+                                        - page_item.source_rotation) // 90 % 4)
+        return file_pages
+
+    def collect_annotations(self, pages=None):
+        """Group annotation records by page, ready to be written to the PDF"""
+        self.finish_loading()
+        for page_num in list(self.pending_annotations):
+            if pages is None or page_num in pages:
+                self.restore_page_annotations(page_num)
+        annotations = {}
+        for annotation in self.item_annotations(pages, for_pdf=True):
+            annotations.setdefault(annotation.page_num, []).append(annotation)
+        return annotations
+
+    def sidecar_path(self, pdf_path=None):
+        return (pdf_path or self.pdf_path) + SIDECAR_SUFFIX
+
+    def load_sidecar(self):
+        """Queue the annotations of a matching sidecar, they are restored as pages come into view"""
+        self.pending_annotations = {}
+        self.sidecar_assets = {}
+        path = self.sidecar_path()
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read {path}: {e}", file=sys.stderr)
+            return
+        if data.get("fingerprint") != self.fingerprint:
+            self.statusBar().showMessage("Annotations were not restored, the PDF changed since "
+                                         "they were saved", 5000)
+            return
+        self.sidecar_assets = data.get("assets", {})
+        self.pending_annotations = {int(page_num): records
+                                    for page_num, records in data.get("pages", {}).items()}
+        # Saved overlays are shown by the restored items, not by the page rendering
+        for page_num in data.get("overlay_pages", []):
+            self.overlay_xrefs[page_num] = page_overlay_xrefs(self.pdf_doc[page_num])
+
+    def restore_page_annotations(self, page_num):
+        records = self.pending_annotations.pop(page_num, None)
+        if not records:
+            return
+        page_item = self.page_items[page_num][0]
+        for data in records:
+            annotation = annotation_from_dict(page_num, data, self.sidecar_assets)
+            item_type = (MovableTextItem if isinstance(annotation, TextAnnotation)
+                         else MovableSignatureItem)
+            item = item_type.from_annotation(annotation, page_item.scenePos(), self.undo_stack)
+            self.scene.addItem(item)
+            self.index_item(item)
+
+    def write_sidecar(self, pdf_path=None):
+        """Record all annotations next to pdf_path, or next to the open document"""
+        path = self.sidecar_path(pdf_path)
+        # The open file still has its pages as they were before unsaved page operations
+        file_pages = self.file_pages() if pdf_path is None and self.structure_changed else None
+        def record_page(page_num):
+            if file_pages is None:
+                return page_num
+            return file_pages.get(page_num, (None,))[0]
+
+        pages = {}
+        assets = {}
+        for page_num, records in self.pending_annotations.items():
+            if record_page(page_num) is None:
+                continue
+            pages[str(record_page(page_num))] = records
+            for data in records:
+                if "asset" in data:
+                    assets[data["asset"]] = self.sidecar_assets[data["asset"]]
+        for annotation in self.item_annotations(file_pages=file_pages):
+            pages.setdefault(str(annotation.page_num), []).append(
+                annotation_to_dict(annotation, assets))
+        overlay_pages = sorted(record_page(page_num) for page_num in self.overlay_xrefs
+                               if record_page(page_num) is not None)
+        if not pages and not self.overlay_xrefs and not os.path.exists(path):
+            if pdf_path is None:
+                self.reset_journal()
+            return
+        data = {
+            "version": SIDECAR_VERSION,
+            "fingerprint": file_fingerprint(pdf_path or self.pdf_path),
+            "overlay_pages": overlay_pages,
+            "pages": pages,
+            "assets": assets,
+        }
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, path)
+        if pdf_path is None:
+            self.reset_journal()
+
+    def journal_path(self):
+        return self.pdf_path + JOURNAL_SUFFIX
+
+    def write_journal(self):
+        """Append the annotations of the pages edited since the last call to the journal"""
+        pages, self.journal_pages = self.journal_pages, set()
+        if not self.pdf_doc:
+            return
+        pages = [page_num for page_num in pages if page_num < len(self.page_items)]
+        for page_num in pages:
+            self.restore_page_annotations(page_num)
+        # Recorded as in the file, like the sidecar the journal is replayed onto
+        file_pages = self.file_pages(pages)
+        records = {file_page: [] for file_page, _ in file_pages.values()}
+        assets = {}
+        for annotation in self.item_annotations(file_pages, file_pages=file_pages):
+            records[annotation.page_num].append(annotation_to_dict(annotation, assets))
+        if not records:
+            return
+        try:
+            if self.journal is None:
+                self.journal = EditJournal(self.journal_path(), self.fingerprint)
+            for page_num, page_records in records.items():
+                self.journal.add_page(page_num, page_records, assets)
+        except OSError as e:
+            self.statusBar().showMessage(f"Could not journal the edit: {e}", 5000)
+            return
+        if not self.journal_timer.isActive():
+            self.journal_timer.start()
+
+    def sync_journal(self):
+        if self.journal is None:
+            return
+        try:
+            self.journal.sync()
+        except OSError as e:
+            print(f"Could not sync {self.journal.path}: {e}", file=sys.stderr)
+
+    def reset_journal(self):
+        """Drop the journal once the sidecar holds everything it recorded"""
+        self.journal_pages = set()
+        self.journal_timer.stop()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if os.path.exists(self.journal_path()):
+            os.remove(self.journal_path())
+
+    def recover_journal(self):
+        """Replay the journal left by a session that ended without writing its sidecar"""
+        recovered = read_journal(self.journal_path(), self.fingerprint)
+        if recovered is None:
+            return
+        pages, assets = recovered
+        self.sidecar_assets.update(assets)
+        for page_num, records in pages.items():
+            if page_num >= len(self.pdf_doc):
+                continue
+            if records:
+                self.pending_annotations[page_num] = records
+            else:
+                self.pending_annotations.pop(page_num, None)
+            # The file does not have these annotations yet
+            self.dirty_pages.add(page_num)
+        # The sidecar takes over the recovered edits and the journal starts over
+        try:
+            self.write_sidecar()
+        except OSError as e:
+            print(f"Could not save annotations: {e}", file=sys.stderr)
+        self.statusBar().showMessage(f"Restored unsaved annotations on {len(pages)} "
+                                     f"page{'s' if len(pages) != 1 else ''}", 5000)
 
     def save_pdf(self):
         if not self.pdf_doc:
             return
             
         try:
-            file, _ = QFileDialog.getSaveFileName(self, "Open PDF", "", "PDF Files (*.pdf)")
+            file, selected_filter = QFileDialog.getSaveFileName(
+                self, "Save PDF", "", ";;".join([*PROFILE_FILTERS, *FLATTEN_FILTERS]))
             if not file:
                 return
 
-            # Create new PDF document and copy original pages
-            new_doc = fitz.open()
-            new_doc.insert_pdf(self.pdf_doc)
+            before = os.path.getsize(self.pdf_path)
+            start = time.perf_counter()
+            if selected_filter in FLATTEN_FILTERS:
+                image_format, profile = FLATTEN_FILTERS[selected_filter]
+                notes = self.save_flattened(file, image_format, profile=SAVE_PROFILES[profile])
+            elif os.path.abspath(file) == os.path.abspath(self.pdf_path):
+                # Only the changes are appended, whatever the profile
+                self.save_incremental()
+                notes = ["Saved incrementally"]
+            else:
+                profile = SAVE_PROFILES[PROFILE_FILTERS.get(selected_filter, "standard")]
+                notes = self.save_vector(file, profile)
+            report = save_report(before, os.path.getsize(file), time.perf_counter() - start)
             
-            # For each page, save its annotations
-            for i, (page_item, _) in enumerate(self.page_items):
-                # Create pixmap for current page with annotations
-                page_rect = page_item.sceneBoundingRect()
-                pixmap = QPixmap(int(page_rect.width()), int(page_rect.height()))
-                pixmap.fill(Qt.white)
-                
-                painter = QPainter(pixmap)
-                painter.setRenderHint(QPainter.Antialiasing)
-                painter.setRenderHint(QPainter.SmoothPixmapTransform)
-                
-                # Set the viewport to only render the current page area
-                source_rect = QRectF(page_rect)
-                target_rect = QRectF(0, 0, page_rect.width(), page_rect.height())
-                self.scene.render(painter, target_rect, source_rect)
-                painter.end()
-
-                # Save current page as temporary image
-                temp_path = f"temp_page_{i}.png"
-                pixmap.save(temp_path, "PNG", quality=95)
-                
-                # Replace page content in new PDF
-                page = new_doc[i]
-                page.insert_image(page.rect, filename=temp_path)
-                
-                # Clean up temp file
-                import os
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-
-            # Save and close the document
-            new_doc.save(file, garbage=3, deflate=True)
-            new_doc.close()
-            
-            QMessageBox.information(self, "Success", "PDF saved successfully!")
+            QMessageBox.information(self, "Success", "\n".join(["PDF saved successfully!", report,
+                                                                *notes]))
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not save PDF: {str(e)}")
 
-    def load_pdf_pages(self):
+    def save_to_source(self):
         if not self.pdf_doc:
             return
-            
+        try:
+            self.save_incremental()
+            self.statusBar().showMessage("Saved " + os.path.basename(self.pdf_path), 3000)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Could not save PDF: {str(e)}")
+
+    def annotated_pages(self):
+        pages = {page_num for page_num, items in self.page_annotations.items() if items}
+        return pages | set(self.pending_annotations)
+
+    def update_overlays(self, pages):
+        """Write the annotations of the given pages into self.pdf_doc"""
+        annotations = self.collect_annotations(pages)
+        for page_num in sorted(pages):
+            self.overlay_xrefs[page_num] = write_overlay(
+                self.pdf_doc[page_num], annotations.get(page_num, []),
+                self.overlay_xrefs.get(page_num, ()), self.image_xrefs)
+
+    def save_incremental(self):
+        """Append only the changed pages to the source file"""
+        with tracer.span("save", mode="incremental", pages=len(self.dirty_pages)):
+            self._save_incremental()
+
+    def _save_incremental(self):
+        saved_state = (dict(self.overlay_xrefs), set(self.dirty_pages))
+        self.update_overlays(self.dirty_pages)
+        if self.pdf_doc.can_save_incrementally():
+            self.pdf_doc.save(self.pdf_path, incremental=True,
+                              encryption=fitz.PDF_ENCRYPT_KEEP)
+            self.dirty_pages.clear()
+            if self.structure_changed:
+                self.rebase_pages()
+            else:
+                self.refresh_fingerprint()
+            self.write_sidecar()
+            return
+
+        # Fall back to rewriting the whole file. garbage=1 keeps object numbers,
+        # so the overlay xrefs stay valid after reopening
+        fd, temp_path = tempfile.mkstemp(suffix=".pdf", dir=os.path.dirname(self.pdf_path))
+        os.close(fd)
+        try:
+            self.pdf_doc.save(temp_path, garbage=1, deflate=True)
+            self.pdf_doc.close()
+            try:
+                os.replace(temp_path, self.pdf_path)
+                self.dirty_pages.clear()
+            except OSError:
+                self.overlay_xrefs, self.dirty_pages = saved_state
+                raise
+            finally:
+                self.pdf_doc = fitz.open(self.pdf_path)
+                self.image_xrefs = {}
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        if self.structure_changed:
+            self.rebase_pages()
+        else:
+            self.refresh_fingerprint()
+        self.write_sidecar()
+
+    def save_vector(self, file, profile=SAVE_PROFILES["standard"]):
+        """Write annotations as native PDF text and images, touching only annotated pages.
+        Returns notes for the save report."""
+        with tracer.span("save", mode="vector", profile=profile.name):
+            # Pages with an older overlay have to be rewritten even if they are empty now
+            self.update_overlays(self.annotated_pages() | set(self.overlay_xrefs))
+            # Garbage collection would renumber the open document's objects, leaving the
+            # overlay and image xrefs pointing at others, and pages deleted by page
+            # operations stay in it for undo
+            notes = save_document(self.pdf_doc, file, profile=profile, copy=True)
+        self.dirty_pages.clear()
+        self.write_sidecar(file)
+        return notes
+
+    def save_flattened(self, file, image_format="PNG", dpi=None,
+                       profile=SAVE_PROFILES["standard"]):
+        """Burn annotations into images of the pages that carry them.
+
+        Pages are composited and encoded in memory on all cores, pages without
+        annotations keep their original content. Returns notes for the save report.
+        """
+        dpi = dpi or profile.flatten_dpi
+        with tracer.span("save", mode="flattened", format=image_format, dpi=dpi,
+                         profile=profile.name):
+            return self._save_flattened(file, image_format, dpi, profile)
+
+    def _save_flattened(self, file, image_format, dpi, profile):
+        annotations = self.collect_annotations()
+        # After page operations the file is out of date, the workers render the document
+        # as it is now from memory, each from its own handle
+        data = self.pdf_doc.tobytes() if self.structure_changed else None
+        handles = threading.local()
+        opened = []
+        def page_document():
+            if data is None:
+                return thread_document(self.pdf_path)
+            if not hasattr(handles, "doc"):
+                handles.doc = fitz.open("pdf", data)
+                opened.append(handles.doc)
+            return handles.doc
+
+        new_doc = fitz.open(self.pdf_path) if data is None else fitz.open("pdf", data)
+        from concurrent.futures import ThreadPoolExecutor
+        try:
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+                pages = sorted(annotations)
+                images = pool.map(
+                    lambda page_num: flatten_page(page_document(), page_num,
+                                                  annotations[page_num], dpi, image_format,
+                                                  page_num in self.overlay_xrefs,
+                                                  profile.jpeg_quality),
+                    pages)
+                for page_num, image_data in zip(pages, images):
+                    page = new_doc[page_num]
+                    if page_num in self.overlay_xrefs:
+                        remove_page_contents(page, page_overlay_xrefs(page))
+                    page.insert_image(page.rect * page.derotation_matrix, stream=image_data,
+                                      rotate=page.rotation)
+            return save_document(new_doc, file, profile=profile)
+        finally:
+            new_doc.close()
+            for doc in opened:
+                doc.close()
+
+    def clear_pages(self):
+        """Drop the pages and annotation items of the previous document"""
+        self.renderer.cancel_all()
         self.scene.clear()
         self.page_items = []
-        
-        current_y = 0
-        page_spacing = 20  # Space between pages
-        
-        for page_num in range(len(self.pdf_doc)):
-            # Get the page
+        self.page_sources = {}
+        self.page_layout.clear()
+        self.page_annotations = {}
+        self.item_pages = {}
+        self.shown_pages = set()
+        self.find_query = ""
+        self.find_hits = []
+        self.find_current = -1
+        self.find_highlights = []
+        self.page_offset = None
+
+    def load_pdf_pages(self):
+        if not self.pdf_doc:
+            return
+
+        # Show the first pages right away and lay out the rest while they render
+        self.add_pages(LAYOUT_FIRST_PAGES)
+        self.update_visible_pages()
+        self.schedule_more_pages()
+
+    def add_pages(self, count):
+        """Lay out the next count pages below the ones already in the scene"""
+        first = len(self.page_items)
+        current_y = self.page_layout.bottoms[-1] + PAGE_SPACING if first else 0
+        for page_num in range(first, min(first + count, len(self.pdf_doc))):
+            # Lay out a placeholder sized from the page, rasterized later on demand
             page = self.pdf_doc[page_num]
-            # Render page to pixmap at 100% scale (72 DPI)
-            zoom = 2.1  # Adjust this value if needed for proper screen DPI
-            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
-            qimage = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
-            pixmap = QPixmap.fromImage(qimage)
-            
-            # Create page container without scaling
-            page_item = QGraphicsPixmapItem(pixmap)
-            page_item.setPos(0, current_y)
+            page_item = PageItem(page_num, page.rect.width * PAGE_ZOOM,
+                                 page.rect.height * PAGE_ZOOM, page.rotation, self.pdf_path,
+                                 page_num)
+            if self.page_offset is None:
+                # Center the content horizontally, by the first page
+                self.page_offset = max(0, (self.view.viewport().width()
+                                           - page_item.rect.width()) / 2)
+            page_item.setPos(self.page_offset, current_y)
             
             # Add page number
-            text_item = QGraphicsTextItem(f"Page {page_num + 1}")
-            text_item.setDefaultTextColor(Qt.gray)
-            text_item.setPos(10, current_y + 10)
+            text_item = self.page_label(page_num)
+            text_item.setPos(self.page_offset + 10, current_y + 10)
             
             # Add items to scene
             self.scene.addItem(page_item)
             self.scene.addItem(text_item)
             self.page_items.append((page_item, text_item))
+            self.register_page(page_item)
+            self.page_layout.append(current_y, page_item.rect.height())
             
             # Update vertical position for next page
-            current_y += pixmap.height() + page_spacing
+            current_y += page_item.rect.height() + PAGE_SPACING
         
-        # Set scene rect to contain all pages
+        # Set scene rect to contain the pages laid out so far
         self.scene.setSceneRect(self.scene.itemsBoundingRect())
-        
-        # Center the content horizontally
-        view_width = self.view.viewport().width()
-        scene_width = self.scene.itemsBoundingRect().width()
-        if scene_width < view_width:
-            offset = (view_width - scene_width) / 2
-            for page_item, text_item in self.page_items:
-                page_item.setPos(offset, page_item.pos().y())
-                text_item.setPos(offset + 10, text_item.pos().y())
+
+    def page_label(self, page_num):
+        text_item = QGraphicsTextItem(f"Page {page_num + 1}")
+        text_item.setDefaultTextColor(Qt.gray)
+        return text_item
+
+    def register_page(self, page_item):
+        self.page_sources.setdefault(page_item.source_key(), []).append(page_item)
+
+    def unregister_page(self, page_item):
+        key = page_item.source_key()
+        page_items = self.page_sources.get(key, [])
+        if page_item in page_items:
+            page_items.remove(page_item)
+        if not page_items:
+            self.page_sources.pop(key, None)
+            self.renderer.cancel_page(key)
+
+    def schedule_more_pages(self):
+        if len(self.page_items) < len(self.pdf_doc):
+            doc = self.pdf_doc
+            QTimer.singleShot(0, lambda: self.load_more_pages(doc))
+        else:
+            self.start_text_index()
+
+    def load_more_pages(self, doc):
+        if doc is not self.pdf_doc:
+            return  # Another document was opened meanwhile
+        self.add_pages(LAYOUT_CHUNK)
+        self.update_visible_pages()
+        self.schedule_more_pages()
+
+    def finish_loading(self):
+        """Lay out every remaining page now, for work that needs all of them"""
+        if self.pdf_doc and len(self.page_items) < len(self.pdf_doc):
+            self.add_pages(len(self.pdf_doc))
+            self.update_visible_pages()
+            self.schedule_more_pages()
+
+    def current_page(self):
+        """Page at the middle of the viewport, or the one just below it"""
+        if not self.page_items:
+            return None
+        center = self.view.mapToScene(self.view.viewport().rect().center())
+        return min(bisect.bisect_right(self.page_layout.bottoms, center.y()),
+                   len(self.page_items) - 1)
+
+    def rotate_current_page(self, turns):
+        page_num = self.current_page()
+        if page_num is not None:
+            self.undo_stack.push(RotatePagesCommand(self, [page_num], turns))
+
+    def move_current_page(self, step):
+        page_num = self.current_page()
+        if page_num is None or not 0 <= page_num + step < len(self.pdf_doc):
+            return
+        self.undo_stack.push(MovePageCommand(self, page_num, page_num + step))
+        self.view.centerOn(self.page_items[page_num + step][0])
+
+    def delete_current_page(self):
+        page_num = self.current_page()
+        # A PDF needs at least one page
+        if page_num is not None and len(self.pdf_doc) > 1 and self.check_page_tree():
+            self.undo_stack.push(RemovePagesCommand(self, [page_num]))
+
+    def insert_blank_page(self):
+        page_num = self.current_page()
+        if page_num is None or not self.check_page_tree():
+            return
+        self.finish_loading()
+        rect = self.page_items[page_num][0].rect
+        self.pdf_doc.new_page(-1, rect.width() / PAGE_ZOOM, rect.height() / PAGE_ZOOM)
+        self.undo_stack.push(InsertPagesCommand(self, self.new_page_states(1, None, page_num + 1)))
+
+    def insert_pdf(self, append=False):
+        """Insert the pages of another PDF after the current page, or at the end"""
+        if not self.pdf_doc or not self.check_page_tree():
+            return
+        file, _ = QFileDialog.getOpenFileName(self, "Insert PDF", "", "PDF Files (*.pdf)")
+        if not file:
+            return
+        self.finish_loading()
+        page_num = len(self.page_items) if append else self.current_page() + 1
+        try:
+            other = fitz.open(file)
+            try:
+                count = len(other)
+                self.source_fingerprints[file] = document_fingerprint(other, file)
+                self.pdf_doc.insert_pdf(other)
+            finally:
+                other.close()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Could not insert PDF: {str(e)}")
+            return
+        if count:
+            self.undo_stack.push(InsertPagesCommand(self, self.new_page_states(count, file,
+                                                                               page_num)))
+
+    def check_page_tree(self):
+        problem = page_tree_unsupported()
+        if problem:
+            QMessageBox.critical(self, "Error", problem)
+        return problem is None
+
+    def new_page_states(self, count, source, page_num):
+        """Take the last count pages just added to self.pdf_doc out again, as states that
+        put_pages inserts at page_num. Their content comes from page 0 on of source."""
+        first = len(self.pdf_doc) - count
+        states = []
+        for i in range(count):
+            page = self.pdf_doc[first + i]
+            page_item = PageItem(page_num + i, page.rect.width * PAGE_ZOOM,
+                                 page.rect.height * PAGE_ZOOM, page.rotation, source,
+                                 i if source is not None else None)
+            states.append(PageState(page_num + i, None, page_item, self.page_label(page_num + i)))
+        for state in reversed(states):
+            state.xref = unlink_page(self.pdf_doc, len(self.pdf_doc) - 1)
+        return states
+
+    def rotate_pages(self, page_nums, turns):
+        """Turn pages clockwise by quarter turns, their annotations go around with them
+        and stay upright"""
+        self.finish_loading()
+        self.reset_find()
+        for page_num in page_nums:
+            # Records not restored yet are in the old orientation
+            self.restore_page_annotations(page_num)
+            page = self.pdf_doc[page_num]
+            page.set_rotation((page.rotation + 90 * turns) % 360)
+            page_item = self.page_items[page_num][0]
+            size = (page_item.rect.width(), page_item.rect.height())
+            self.unregister_page(page_item)
+            page_item.prepareGeometryChange()
+            page_item.page_rotation = page.rotation
+            if turns % 2:
+                page_item.rect = QRectF(0, 0, size[1], size[0])
+            page_item.clear_pixmap()
+            self.shown_pages.discard(page_num)
+            self.register_page(page_item)
+            origin = page_item.pos()
+            items = self.page_annotations.get(page_num, {})
+            for item in items:
+                center = item.sceneBoundingRect().center() - origin
+                x, y = rotate_page_point((center.x(), center.y()), size, turns)
+                item.moveBy(x - center.x(), y - center.y())
+            if items or page_num in self.overlay_xrefs:
+                self.dirty_pages.add(page_num)
+            if self.text_index is not None:
+                self.text_index.pages.pop(page_num, None)
+        self.relayout(min(page_nums))
+        self.pages_changed()
+
+    def move_page(self, page_num, new_page_num):
+        """Move a page, only the pages in between are laid out again"""
+        self.finish_loading()
+        self.reset_find()
+        first, last = sorted((page_num, new_page_num))
+        old_items = [page_item for page_item, _ in self.page_items[first:last + 1]]
+        # Before the page now at new_page_num, or after it when moving down
+        to = new_page_num + 1 if new_page_num > page_num else new_page_num
+        self.pdf_doc.move_page(page_num, to if to < len(self.pdf_doc) else -1)
+        self.page_items.insert(new_page_num, self.page_items.pop(page_num))
+        self.renumber_pages(old_items, first, last + 1)
+        self.relayout(first, last + 1)
+        self.pages_changed()
+
+    def take_pages(self, page_nums):
+        """Remove pages from the document and the scene, returned as PageStates with
+        everything attached to them"""
+        self.finish_loading()
+        self.reset_find()
+        first = min(page_nums)
+        old_items = [page_item for page_item, _ in self.page_items[first:]]
+        states = []
+        for page_num in sorted(page_nums, reverse=True):
+            page_item, label = self.page_items.pop(page_num)
+            state = PageState(page_num, unlink_page(self.pdf_doc, page_num), page_item, label)
+            for item in self.page_annotations.pop(page_num, {}):
+                state.items.append((item, item.pos() - page_item.pos()))
+                del self.item_pages[item]
+                self.scene.removeItem(item)
+            state.overlay_xrefs = self.overlay_xrefs.pop(page_num, None)
+            state.pending = self.pending_annotations.pop(page_num, None)
+            state.dirty = page_num in self.dirty_pages
+            self.dirty_pages.discard(page_num)
+            self.shown_pages.discard(page_num)
+            if self.text_index is not None:
+                state.text_entry = self.text_index.pages.pop(page_num, None)
+            self.unregister_page(page_item)
+            page_item.clear_pixmap()  # The pixmap cache still has it
+            self.scene.removeItem(page_item)
+            self.scene.removeItem(label)
+            states.append(state)
+        self.renumber_pages(old_items, first)
+        self.relayout(first)
+        self.pages_changed()
+        states.reverse()
+        return states
+
+    def put_pages(self, states):
+        """Insert pages from take_pages() or new_page_states() at their page numbers"""
+        self.finish_loading()
+        self.reset_find()
+        first = states[0].page_num
+        old_items = [page_item for page_item, _ in self.page_items[first:]]
+        for state in states:
+            link_page(self.pdf_doc, state.page_num, state.xref)
+            self.page_items.insert(state.page_num, (state.page_item, state.label))
+            self.scene.addItem(state.page_item)
+            self.scene.addItem(state.label)
+        self.renumber_pages(old_items, first)
+        self.relayout(first)
+        for state in states:
+            page_num, page_item = state.page_num, state.page_item
+            self.register_page(page_item)
+            for item, offset in state.items:
+                item.setPos(page_item.pos() + offset)
+                self.scene.addItem(item)
+                self.item_pages[item] = page_num
+                self.page_annotations.setdefault(page_num, {})[item] = None
+            if state.overlay_xrefs is not None:
+                self.overlay_xrefs[page_num] = state.overlay_xrefs
+            if state.pending is not None:
+                self.pending_annotations[page_num] = state.pending
+            if state.dirty:
+                self.dirty_pages.add(page_num)
+            if state.text_entry is not None and self.text_index is not None:
+                self.text_index.pages[page_num] = state.text_entry
+        self.pages_changed()
+
+    def renumber_pages(self, old_items, first, end=None):
+        """Move per-page state to the new numbers of the pages that moved, old_items are
+        the page items from first on as they were before, those that are gone lose it"""
+        new_nums = {page_item: page_num for page_num, (page_item, _)
+                    in enumerate(self.page_items[first:end], first)}
+        mapping = {}
+        for page_num, page_item in enumerate(old_items, first):
+            new_num = new_nums.get(page_item)
+            if new_num != page_num:
+                mapping[page_num] = new_num
+        by_page = [self.overlay_xrefs, self.pending_annotations, self.page_annotations]
+        if self.text_index is not None:
+            by_page.append(self.text_index.pages)
+        for pages in by_page:
+            moved = [(mapping[page_num], pages.pop(page_num)) for page_num in mapping
+                     if page_num in pages]
+            pages.update((page_num, value) for page_num, value in moved if page_num is not None)
+        for pages in (self.dirty_pages, self.shown_pages):
+            moved = {mapping[page_num] for page_num in mapping if page_num in pages}
+            pages.difference_update(mapping)
+            pages.update(moved - {None})
+        for page_num in mapping.values():
+            for item in self.page_annotations.get(page_num, ()):
+                self.item_pages[item] = page_num
+
+    def relayout(self, first, end=None):
+        """Position the pages from first up to end, None for all the rest, after pages were
+        added, removed, moved or turned. Annotation items move with their page."""
+        y = self.page_layout.bottoms[first - 1] + PAGE_SPACING if first else 0
+        tops, bottoms = [], []
+        for page_num in range(first, len(self.page_items) if end is None else end):
+            page_item, label = self.page_items[page_num]
+            offset = QPointF(self.page_offset, y) - page_item.pos()
+            if not offset.isNull():
+                page_item.moveBy(offset.x(), offset.y())
+                for item in self.page_annotations.get(page_num, ()):
+                    item.moveBy(offset.x(), offset.y())
+            label.setPos(self.page_offset + 10, y + 10)
+            if page_item.page_num != page_num:
+                page_item.page_num = page_num
+                label.setPlainText(f"Page {page_num + 1}")
+            tops.append(y)
+            bottoms.append(y + page_item.rect.height())
+            y = bottoms[-1] + PAGE_SPACING
+        self.page_layout.replace(first, end, tops, bottoms)
+        self.scene.setSceneRect(self.scene.itemsBoundingRect())
+
+    def pages_changed(self):
+        """Bring the text index and the renderings up to date after a page operation"""
+        if not self.structure_changed:
+            self.structure_changed = True
+            # The cached index is for the file, which no longer matches
+            self.text_indexes.pop(self.fingerprint, None)
+        if self.text_index is not None:
+            self.index_pages()
+        self.update_visible_pages()
+
+    def rebase_pages(self):
+        """After the document was written over its file, render its pages from there"""
+        self.renderer.cancel_all()
+        self.refresh_fingerprint()
+        self.source_fingerprints = {self.pdf_path: self.fingerprint}
+        self.page_sources = {}
+        for page_num, (page_item, _) in enumerate(self.page_items):
+            page_item.source, page_item.source_page = self.pdf_path, page_num
+            page_item.source_rotation = page_item.page_rotation
+            self.register_page(page_item)
+        if self.text_index is not None:
+            self.text_indexes[self.fingerprint] = self.text_index
+        self.structure_changed = False
+        # Page operations cannot be undone against the new file
+        self.undo_stack.clear()
+        self.update_visible_pages()
+
+    def refresh_fingerprint(self):
+        """Key renderings, the text index and the journal by the file just written over the
+        open one, and have the workers read it again"""
+        reopen_thread_documents()
+        old_fingerprint = self.fingerprint
+        self.fingerprint = document_fingerprint(self.pdf_doc, self.pdf_path)
+        self.source_fingerprints[self.pdf_path] = self.fingerprint
+        index = self.text_indexes.pop(old_fingerprint, None)
+        if index is not None:
+            self.text_indexes[self.fingerprint] = index
+
+    def page_cache_key(self, page_item, zoom=PAGE_ZOOM, tile=None):
+        return (self.source_fingerprints.get(page_item.source), page_item.source_page, zoom,
+                page_item.page_rotation, tile)
+
+    def render_zoom(self):
+        """Zoom of the resolution level matching the view scale and device pixel ratio"""
+        scale = self.view.transform().m11() * self.view.devicePixelRatioF()
+        level = math.ceil(math.log2(scale) - 1e-6)
+        return PAGE_ZOOM * 2 ** min(MAX_LEVEL, max(MIN_LEVEL, level))
+
+    def visible_tiles(self, page_item, visible, zoom):
+        """Tiles at zoom that cover the part of the page inside the visible scene rect"""
+        area = page_item.mapRectFromScene(visible).intersected(page_item.rect)
+        if area.isEmpty():
+            return []
+        scale = zoom / PAGE_ZOOM / TILE_SIZE
+        columns = range(int(area.left() * scale), math.ceil(area.right() * scale))
+        rows = range(int(area.top() * scale), math.ceil(area.bottom() * scale))
+        return [(column, row) for row in rows for column in columns]
+
+    def request_render(self, page_item, zoom, tile=None, priority=0):
+        if page_item.source is None:
+            return  # A blank page is drawn as such
+        pixmap = self.pixmap_cache.get(self.page_cache_key(page_item, zoom, tile))
+        if pixmap is not None:
+            self.apply_render(page_item, zoom, tile, pixmap)
+            self.trace_pixmap_cache()
+        else:
+            self.renderer.request((page_item.source_key(), zoom, tile),
+                                  page_item.page_num in self.overlay_xrefs, priority)
+
+    def trace_pixmap_cache(self):
+        cache = self.pixmap_cache
+        tracer.counter("pixmap_cache", bytes=cache.size_bytes, entries=len(cache.entries),
+                       hits=cache.hits, misses=cache.misses, evictions=cache.evictions)
+
+    def apply_render(self, page_item, zoom, tile, pixmap):
+        self.shown_pages.add(page_item.page_num)
+        if self.first_page_seconds is None:
+            # Rendered or taken from the pixmap cache
+            self.first_page_seconds = time.perf_counter() - self.open_time
+            tracer.counter("first_page", seconds=self.first_page_seconds,
+                           since_launch=time.perf_counter() - LAUNCH_TIME)
+        if tile is None:
+            page_item.set_pixmap(pixmap, zoom)
+        else:
+            page_item.set_tile(zoom, tile, pixmap)
+
+    def update_visible_pages(self):
+        """Rasterize pages near the viewport and drop pixmaps of distant ones"""
+        if not self.page_items:
+            return
+        visible = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+        height = visible.height()
+        # Render further ahead in the direction of travel and less behind
+        ahead, behind = self.prefetch_margins()
+        above, below = (behind, ahead) if self.scroll_velocity >= 0 else (ahead, behind)
+        render_area = visible.adjusted(0, -above * height, 0, below * height)
+        keep_area = visible.adjusted(0, -max(above, KEEP_MARGIN) * height,
+                                     0, max(below, KEEP_MARGIN) * height)
+        zoom = self.render_zoom()
+        # The whole-page preview never exceeds the base resolution, higher levels are tiled
+        preview_zoom = min(zoom, PAGE_ZOOM)
+
+        # Only pages near the viewport and pages still holding pixmaps or jobs need a look
+        pages = set(self.page_layout.pages_between(keep_area.top(), keep_area.bottom()))
+        pages |= self.shown_pages
+        pages.update(page_item.page_num for page in {key[0] for key in self.renderer.jobs}
+                     for page_item in self.page_sources.get(page, ()))
+        for page_num in sorted(pages):
+            page_item = self.page_items[page_num][0]
+            page_rect = page_item.sceneBoundingRect()
+            if not page_rect.intersects(render_area):
+                # Queued jobs for pages that scrolled away are no longer needed
+                self.renderer.cancel_page(page_item.source_key())
+                if not page_rect.intersects(keep_area):
+                    if page_item.pixmap is not None or page_item.tiles:
+                        page_item.clear_pixmap()
+                    self.shown_pages.discard(page_num)
+                else:
+                    page_item.drop_tiles()
+                continue
+
+            if page_num in self.pending_annotations:
+                self.restore_page_annotations(page_num)
+            wanted = set()
+            if zoom > PAGE_ZOOM:
+                wanted = set(self.visible_tiles(page_item, visible, zoom))
+            for key in self.renderer.page_jobs(page_item.source_key()):
+                _, job_zoom, tile = key
+                if (job_zoom != preview_zoom) if tile is None else (
+                        job_zoom != zoom or tile not in wanted):
+                    self.renderer.cancel(key)
+
+            priority = self.render_priority(page_rect, visible)
+            if page_item.pixmap_zoom != preview_zoom:
+                self.request_render(page_item, preview_zoom, priority=priority)
+            for tile in wanted:
+                if (zoom, *tile) not in page_item.tiles:
+                    self.request_render(page_item, zoom, tile, priority - 1)
+            self.prune_tiles(page_item, zoom, wanted)
+
+    def prefetch_margins(self):
+        """Viewport heights to render ahead of and behind the direction of scrolling"""
+        speed = abs(self.scroll_velocity) / max(1, self.view.viewport().height())
+        if not speed:
+            return RENDER_MARGIN, RENDER_MARGIN
+        return RENDER_MARGIN + min(MAX_PREFETCH, speed * PREFETCH_SECONDS), RENDER_MARGIN / 2
+
+    def render_priority(self, page_rect, visible):
+        """Visible pages first, then pages ahead by distance, then pages behind"""
+        if page_rect.intersects(visible):
+            return 1000
+        if page_rect.top() >= visible.bottom():
+            distance, ahead = page_rect.top() - visible.bottom(), self.scroll_velocity >= 0
+        else:
+            distance, ahead = visible.top() - page_rect.bottom(), self.scroll_velocity <= 0
+        steps = int(10 * distance / max(1, visible.height()))
+        return (500 if ahead else 0) - min(steps, 499)
+
+    def on_vertical_scroll(self, value):
+        now = time.perf_counter()
+        if self.last_scroll is not None:
+            last_value, last_time = self.last_scroll
+            elapsed = now - last_time
+            if elapsed * 1000 > SCROLL_IDLE_MS:
+                self.scroll_velocity = 0.0
+            elif elapsed > 0:
+                # Smoothed, single events of a fast scroll are noisy
+                self.scroll_velocity = (0.5 * self.scroll_velocity
+                                        + 0.5 * (value - last_value) / elapsed)
+        self.last_scroll = (value, now)
+        self.scroll_idle_timer.start()
+        self.update_visible_pages()
+
+    def on_scroll_idle(self):
+        # Once scrolling stops, the pages behind are as likely to be needed as those ahead
+        self.scroll_velocity = 0.0
+        self.update_visible_pages()
+
+    def smooth_scroll(self, event):
+        """Glide towards where the wheel points, repeated notches add up and go further"""
+        scroll_bar = self.view.verticalScrollBar()
+        if not event.pixelDelta().isNull():
+            # Touchpads deliver their own smooth, kinetic deltas
+            scroll_bar.setValue(scroll_bar.value() - event.pixelDelta().y())
+            return
+        start = self.scroll_target if self.scroll_target is not None else scroll_bar.value()
+        target = start - event.angleDelta().y() * SCROLL_STEP / 120
+        self.scroll_target = max(scroll_bar.minimum(), min(scroll_bar.maximum(), target))
+        if not self.scroll_timer.isActive():
+            self.scroll_timer.start()
+
+    def scroll_frame(self):
+        scroll_bar = self.view.verticalScrollBar()
+        # The range shrinks when pages are deleted or the window is resized
+        self.scroll_target = max(scroll_bar.minimum(), min(scroll_bar.maximum(),
+                                                           self.scroll_target))
+        value = scroll_bar.value()
+        remaining = self.scroll_target - value
+        if abs(remaining) < 1:
+            scroll_bar.setValue(round(self.scroll_target))
+            self.stop_smooth_scroll()
+            return
+        step = remaining * SCROLL_EASING
+        scroll_bar.setValue(value + (math.ceil(step) if step > 0 else math.floor(step)))
+        if scroll_bar.value() == value:
+            self.stop_smooth_scroll()
+
+    def stop_smooth_scroll(self):
+        self.scroll_target = None
+        self.scroll_timer.stop()
+
+    def prune_tiles(self, page_item, zoom, wanted):
+        """Drop tiles that are off screen, and other levels once the current one is complete"""
+        level_pending = any(job_zoom == zoom and tile is not None for _, job_zoom, tile
+                            in self.renderer.page_jobs(page_item.source_key()))
+        page_item.drop_tiles(lambda key: key[1:] in wanted if key[0] == zoom
+                             else level_pending)
+
+    def on_page_rendered(self, key, image):
+        page, zoom, tile = key
+        page_items = self.page_sources.get(page)
+        if not page_items:
+            return
+        with tracer.span("pixmap", page=page[1], zoom=zoom, tile=tile):
+            pixmap = QPixmap.fromImage(image)
+        self.pixmap_cache.put(self.page_cache_key(page_items[0], zoom, tile), pixmap)
+        self.trace_pixmap_cache()
+        for page_item in page_items:
+            self.apply_render(page_item, zoom, tile, pixmap)
+        if tile is not None:
+            visible = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+            for page_item in page_items:
+                self.prune_tiles(page_item, self.render_zoom(),
+                                 set(self.visible_tiles(page_item, visible, self.render_zoom())))
+
+    def start_text_index(self):
+        """Reuse the index of this exact file if there is one, otherwise build it in the background"""
+        index = self.text_indexes.pop(self.fingerprint, None)
+        if index is None:
+            index = TextIndex(len(self.pdf_doc))
+        self.text_indexes[self.fingerprint] = index
+        while len(self.text_indexes) > TEXT_INDEX_CACHE:
+            self.text_indexes.popitem(last=False)
+        self.text_index = index
+        self.index_pages()
+
+    def index_pages(self):
+        """Index the pages missing from the text index in the background"""
+        index = self.text_index
+        index.page_count = len(self.page_items)
+        self.indexer.start(index, [(page_num, page_item.source, page_item.source_page,
+                                    page_item.page_rotation)
+                                   for page_num, (page_item, _) in enumerate(self.page_items)
+                                   if page_num not in index.pages])
+
+    def on_page_indexed(self, page_num):
+        if self.find_query:
+            hits = self.text_index.search_page(page_num, self.find_query)
+            self.find_hits.extend((page_num, rects) for rects in hits)
+            if hits and self.find_current < 0:
+                self.show_find_hit(0)  # The first match is shown as soon as it is found
+            else:
+                self.show_find_status()
+
+    def find_next(self):
+        self.find(1)
+
+    def find_previous(self):
+        self.find(-1)
+
+    def find(self, step):
+        if self.text_index is None:
+            return
+        query = " ".join(self.find_box.text().lower().split())
+        if query != self.find_query:
+            # Search what is indexed so far, pages indexed later are searched as they arrive
+            self.find_query = query
+            self.find_hits = []
+            self.find_current = -1
+            if query:
+                for page_num in sorted(self.text_index.pages):
+                    self.find_hits.extend((page_num, rects) for rects
+                                          in self.text_index.search_page(page_num, query))
+            if self.find_hits:
+                self.show_find_hit(0)
+            else:
+                self.clear_find_highlights()
+                self.show_find_status()
+        elif self.find_hits:
+            self.show_find_hit((self.find_current + step) % len(self.find_hits))
+
+    def reset_find(self):
+        self.clear_find_highlights()
+        self.find_query = ""
+        self.find_hits = []
+        self.find_current = -1
+
+    def clear_find_highlights(self):
+        for highlight in self.find_highlights:
+            self.scene.removeItem(highlight)
+        self.find_highlights = []
+
+    def show_find_hit(self, hit):
+        self.clear_find_highlights()
+        self.find_current = hit
+        page_num, rects = self.find_hits[hit]
+        page_item = self.page_items[page_num][0]
+        for rect in rects:
+            highlight = QGraphicsRectItem(QRectF(rect.x0 * PAGE_ZOOM, rect.y0 * PAGE_ZOOM,
+                                                 rect.width * PAGE_ZOOM, rect.height * PAGE_ZOOM),
+                                          page_item)
+            highlight.setBrush(QColor(255, 200, 0, 100))
+            highlight.setPen(QPen(Qt.NoPen))
+            self.find_highlights.append(highlight)
+        self.view.centerOn(self.find_highlights[0].sceneBoundingRect().center())
+        self.show_find_status()
+
+    def show_find_status(self):
+        if not self.find_query:
+            return
+        message = (f"Match {self.find_current + 1} of {len(self.find_hits)}" if self.find_hits
+                   else "No matches")
+        if not self.text_index.is_complete():
+            message += f" (searched {len(self.text_index.pages)} of "\
+                       f"{self.text_index.page_count} pages)"
+        self.statusBar().showMessage(message)
+
+    def zoom_by(self, factor):
+        scale = self.view.transform().m11()
+        factor = max(MIN_VIEW_SCALE / scale, min(MAX_VIEW_SCALE / scale, factor))
+        self.stop_smooth_scroll()  # The target was in the old scale
+        self.view.scale(factor, factor)
+        self.update_visible_pages()
+
+    def eventFilter(self, obj, event):
+        # Ctrl+wheel zooms around the cursor instead of scrolling
+        if obj is self.view.viewport() and event.type() == QEvent.Wheel:
+            if event.modifiers() & Qt.ControlModifier:
+                self.zoom_by(1.25 ** (event.angleDelta().y() / 120))
+                return True
+            if event.angleDelta().y() and not event.modifiers():
+                self.smooth_scroll(event)
+                return True
+        return super().eventFilter(obj, event)
+
+    def closeEvent(self, event):
+        self.indexer.cancel()
+        if self.pdf_doc:
+            try:
+                self.write_sidecar()
+            except OSError as e:
+                QMessageBox.warning(self, "Warning", f"Could not save annotations: {str(e)}")
+        super().closeEvent(event)
 
     # Add resize event handler
     def resizeEvent(self, event):
@@ -537,20 +3158,142 @@ class PDFEditor(QMainWindow):
             sceneRect = self.view.transform().mapRect(self.scene.sceneRect())
             if sceneRect.width() < viewRect.width() and sceneRect.height() < viewRect.height():
                 self.view.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
+        if hasattr(self, 'view'):
+            self.update_visible_pages()
 
     # Add this new method to handle wheel events
     def wheelEvent(self, event):
         if self.view.verticalScrollBar().isVisible():
-            # Convert the delta calculation to an integer
-            delta = int(event.angleDelta().y() / 120)
-            current_value = self.view.verticalScrollBar().value()
-            new_value = current_value - (delta * 30)
-            # Ensure the value is an integer
-            self.view.verticalScrollBar().setValue(int(new_value))
+            self.smooth_scroll(event)
         event.accept()
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
+def load_template(path):
+    """Read a batch annotation template into (pages, annotation) pairs.
+
+    pages is "all" or a list of 1-based page numbers, negative numbers count
+    from the last page. Geometry is in PDF points, as in the editor's records.
+    """
+    with open(path, encoding="utf-8") as f:
+        template = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    entries = []
+    for entry in template["annotations"]:
+        pages = entry.get("pages", [1])
+        if entry["type"] == "text":
+            annotation = annotation_from_dict(None, entry, {})
+            fontname = base14_fontname(annotation.font_family, annotation.bold, annotation.italic)
+            if not text_is_encodable(annotation.text, fontname):
+                raise ValueError(f"Text {annotation.text!r} cannot be written with a base-14 font")
+        elif entry["type"] == "signature":
+            with open(os.path.join(base_dir, entry["image"]), "rb") as f:
+                annotation = ImageAnnotation(None, tuple(entry["rect"]), f.read())
+        else:
+            raise ValueError(f"Unknown annotation type {entry['type']!r}")
+        entries.append((pages, annotation))
+    return entries
+
+def template_annotations(entries, page_count):
+    """Resolve template entries into annotation records grouped by page"""
+    annotations = {}
+    for pages, annotation in entries:
+        if pages == "all":
+            page_nums = range(page_count)
+        else:
+            page_nums = [page - 1 if page > 0 else page_count + page for page in pages]
+        for page_num in page_nums:
+            if 0 <= page_num < page_count:
+                record = copy.copy(annotation)
+                record.page_num = page_num
+                annotations.setdefault(page_num, []).append(record)
+    return annotations
+
+_batch_template = None
+_batch_profile = SAVE_PROFILES["standard"]
+
+def _init_batch_worker(entries, profile_name="standard"):
+    global _batch_template, _batch_profile
+    _batch_template = entries
+    _batch_profile = SAVE_PROFILES[profile_name]
+
+def annotate_file(input_path, output_path):
+    """Apply the worker's template to one PDF, returning (seconds, error)"""
+    start = time.perf_counter()
+    try:
+        doc = fitz.open(input_path)
+        try:
+            image_xrefs = {}
+            for page_num, annotations in template_annotations(_batch_template, len(doc)).items():
+                write_overlay(doc[page_num], annotations, image_xrefs=image_xrefs)
+            save_document(doc, output_path, profile=_batch_profile)
+        finally:
+            doc.close()
+    except Exception as e:
+        return time.perf_counter() - start, str(e)
+    return time.perf_counter() - start, None
+
+def run_batch(argv):
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    parser = argparse.ArgumentParser(
+        prog="pdf_editor.py batch",
+        description="Stamp the annotations of a template onto many PDFs without a display.")
+    parser.add_argument("inputs", nargs="+", help="PDF files to annotate")
+    parser.add_argument("-t", "--template", required=True, help="JSON annotation template")
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory for annotated PDFs")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("-p", "--profile", choices=list(SAVE_PROFILES), default="standard",
+                        help="Size optimization of the output (default: standard)")
+    args = parser.parse_args(argv)
+
+    entries = load_template(args.template)
+    if SAVE_PROFILES[args.profile].image_dpi and image_rewriting_unsupported():
+        print(image_rewriting_unsupported(), file=sys.stderr)
+    os.makedirs(args.output_dir, exist_ok=True)
+    failures = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_batch_worker,
+                             initargs=(entries, args.profile)) as pool:
+        futures = {
+            pool.submit(annotate_file, path,
+                        os.path.join(args.output_dir, os.path.basename(path))): path
+            for path in args.inputs
+        }
+        # Report each file as soon as it is done
+        for future in as_completed(futures):
+            seconds, error = future.result()
+            if error is None:
+                print(f"ok\t{seconds:.3f}s\t{futures[future]}", flush=True)
+            else:
+                failures += 1
+                print(f"error\t{seconds:.3f}s\t{futures[future]}\t{error}", flush=True)
+    print(f"{len(args.inputs) - failures} of {len(args.inputs)} files annotated "
+          f"in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 1 if failures else 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "batch":
+        return run_batch(argv[1:])
+    parser = argparse.ArgumentParser(prog="pdf_editor.py")
+    parser.add_argument("file", nargs="?", help="PDF file to open")
+    parser.add_argument("--trace", metavar="FILE", default=os.environ.get("PDF_EDITOR_TRACE"),
+                        help="Record timings and write them as a Chrome trace on exit "
+                             "(also PDF_EDITOR_TRACE)")
+    # Anything else is left to Qt
+    args, qt_args = parser.parse_known_args(argv)
+    if args.trace:
+        tracer.enable(args.trace)
+    if args.file:
+        fitz.preload()  # Loads while the window is built
+    app = QApplication(sys.argv[:1] + qt_args)
     window = PDFEditor()
     window.show()
-    sys.exit(app.exec_())
+    if args.file:
+        # Open once the window has been shown
+        QTimer.singleShot(0, lambda: window.open_document(args.file))
+    status = app.exec_()
+    tracer.export()
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Round trips of annotations through the save paths, under Qt's offscreen platform"""
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+import pytest
+from PyQt5.QtCore import QPointF
+from PyQt5.QtWidgets import QApplication
+
+import pdf_editor
+
+PAGES = 5
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([sys.argv[0]])
+
+@pytest.fixture
+def source(tmp_path):
+    """A PDF whose last incremental update left unused objects behind"""
+    path = str(tmp_path / "source.pdf")
+    doc = fitz.open()
+    for page_num in range(PAGES):
+        doc.new_page().insert_text((72, 72), f"Page {page_num + 1}")
+    doc.save(path)
+    doc.close()
+    doc = fitz.open(path)
+    for _ in range(3):
+        doc.update_object(doc.get_new_xref(), "<< /Unused true >>")
+    doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    doc.close()
+    return path
+
+@pytest.fixture
+def editor(app, source):
+    window = pdf_editor.PDFEditor()
+    window.resize(800, 600)
+    window.open_document(source)
+    window.finish_loading()
+    app.processEvents()
+    yield window
+    window.close()
+
+def add_text(editor, page_num, text):
+    item = pdf_editor.MovableTextItem(text, editor.undo_stack)
+    item.setPos(editor.page_items[page_num][0].scenePos() + QPointF(100, 100))
+    editor.undo_stack.push(pdf_editor.AddItemCommand(editor.scene, item))
+
+def add_signature(editor, page_num):
+    asset = pdf_editor.signature_assets.add_strokes([[[0, 0], [60, 40], [120, 10]]], (120, 60))
+    editor.add_signature_at_position(asset, editor.page_items[page_num][0].scenePos()
+                                     + QPointF(300, 400))
+
+def assert_overlays_in_pages(editor):
+    for page_num, xrefs in editor.overlay_xrefs.items():
+        assert set(xrefs) <= set(editor.pdf_doc[page_num].get_contents())
+
+def test_save_as_twice_writes_each_annotation_once(editor, tmp_path):
+    add_text(editor, 0, "A1")
+    add_signature(editor, 0)
+    first = str(tmp_path / "first.pdf")
+    editor.save_vector(first)
+    assert_overlays_in_pages(editor)
+
+    add_text(editor, 1, "A2")
+    second = str(tmp_path / "second.pdf")
+    editor.save_vector(second)
+    assert_overlays_in_pages(editor)
+
+    with fitz.open(first) as old, fitz.open(second) as new:
+        assert new[0].get_text().count("A1") == 1
+        assert len(new[0].get_drawings()) == len(old[0].get_drawings())
+        assert new[1].get_text().count("A2") == 1
+
+def test_save_as_then_save_in_place_keeps_the_source(editor, source, tmp_path):
+    add_text(editor, 0, "A1")
+    editor.save_vector(str(tmp_path / "copy.pdf"))
+    add_text(editor, 1, "A2")
+    editor.save_incremental()
+
+    fitz.TOOLS.mupdf_warnings()  # Drop earlier warnings
+    with fitz.open(source) as doc:
+        texts = [page.get_text() for page in doc]
+    assert fitz.TOOLS.mupdf_warnings() == ""
+    assert len(texts) == PAGES
+    for page_num, text in enumerate(texts):
+        assert f"Page {page_num + 1}" in text
+    assert texts[0].count("A1") == 1
+    assert texts[1].count("A2") == 1